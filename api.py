@@ -1,38 +1,182 @@
-import uvicorn
-from fastapi import FastAPI, HTTPException, Depends, Request
+import asyncio
+import json
+import logging
+import os
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from fastapi import FastAPI, HTTPException, Depends, Request, Query, UploadFile, File
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, FileResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 import secrets
-from datetime import datetime, timedelta
-from database import DatabaseManager
-from config import API_HOST, API_PORT, ADMIN_USERNAME, ADMIN_PASSWORD
+from datetime import datetime, timedelta, timezone
+from config import (
+    API_HOST, API_PORT, ADMIN_USERNAME, ADMIN_PASSWORD, DATABASE_PATH,
+    STORAGE_BACKEND, STORAGE_WRITE_THROUGH, STORAGE_SYNC_INTERVAL,
+    CHANGES_RETENTION_DAYS, SLOW_QUERY_MS, DEBUG_PROFILING,
+    MAINTENANCE_ENABLED, MAINTENANCE_INTERVAL, MAINTENANCE_IDLE_SECONDS, MAINTENANCE_VACUUM_PAGES,
+    SNAPSHOT_DIR, SNAPSHOT_KEEP, SNAPSHOT_COMPRESS, SNAPSHOT_STEP_PAGES,
+    MEDIA_DIR, MEDIA_MAX_BYTES
+)
+from profiler import Profiler
+
+
+logger = logging.getLogger(__name__)
+
+ADMIN_HTML_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "admin.html")
+
+
+# Хранилище создается при старте приложения, а не при импорте модуля
+@lru_cache(maxsize=None)
+def get_db():
+    from storage import create_storage
+    return create_storage(
+        STORAGE_BACKEND, DATABASE_PATH, STORAGE_WRITE_THROUGH, STORAGE_SYNC_INTERVAL,
+        CHANGES_RETENTION_DAYS, SLOW_QUERY_MS
+    )
+
+
+@lru_cache(maxsize=None)
+def get_scheduler():
+    from scheduler import PublicationScheduler
+    scheduler = PublicationScheduler(get_db())
+    scheduler.add_hook(log_publication)
+    return scheduler
+
+
+@lru_cache(maxsize=None)
+def get_maintenance():
+    from maintenance import DatabaseMaintenance
+    return DatabaseMaintenance(
+        DATABASE_PATH, MAINTENANCE_INTERVAL, MAINTENANCE_IDLE_SECONDS, MAINTENANCE_VACUUM_PAGES,
+        media_dir=MEDIA_DIR
+    )
+
+
+@lru_cache(maxsize=None)
+def get_media():
+    from media import MediaStore
+    return MediaStore(MEDIA_DIR, MEDIA_MAX_BYTES)
+
+
+def uses_sqlite() -> bool:
+    return STORAGE_BACKEND == "sqlite" or STORAGE_WRITE_THROUGH
+
+
+def log_publication(post):
+    logger.info(f"Опубликован отложенный пост {post.id}: {post.title}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_db().create_tables()
+    await get_scheduler().start()
+    if MAINTENANCE_ENABLED and uses_sqlite():
+        get_maintenance().start()
+    yield
+    await get_scheduler().stop()
+    if MAINTENANCE_ENABLED and uses_sqlite():
+        await get_maintenance().stop()
 
 
 app = FastAPI(
     title="Blog Admin API",
     description="API для управления постами блога",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 security = HTTPBasic()
-db = DatabaseManager()
+profiler = Profiler()
+
+
+class ProfilingMiddleware:
+    # Чистый ASGI-слой: при выключенном профилировании - одна проверка флага
+    def __init__(self, app, profiler: Profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if not self.profiler.active or scope["type"] != "http" or scope["path"].startswith("/debug/"):
+            return await self.app(scope, receive, send)
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.profiler.request_finished()
+
+
+app.add_middleware(ProfilingMiddleware, profiler=profiler)
 
 
 class PostCreate(BaseModel):
     title: str
     content: str
+    publish_at: Optional[datetime] = None
 
 class PostUpdate(BaseModel):
     title: str
     content: str
+    publish_at: Optional[datetime] = None
 
 class PostResponse(BaseModel):
     id: int
     title: str
     content: str
     created_at: str
+    publish_at: Optional[str] = None
+
+class AttachmentResponse(BaseModel):
+    id: int
+    post_id: int
+    hash: str
+    filename: str
+    content_type: str
+    size: int
+    url: str
+
+class ScheduledPublication(BaseModel):
+    post_id: int
+    publish_at: str
+
+class PostChange(BaseModel):
+    version: int
+    post_id: int
+    op: str
+    post: Optional[PostResponse] = None
+
+class ChangesResponse(BaseModel):
+    version: int
+    changes: List[PostChange]
+    has_more: bool
+    reset: bool
+
+class ProfileStart(BaseModel):
+    mode: str = "cprofile"
+    requests: int = 0
+    seconds: float = 0.0
+    interval: float = 0.005
+
+class QueryStats(BaseModel):
+    statement: str
+    callers: List[str]
+    calls: int
+    total_ms: float
+    avg_ms: float
+    max_ms: float
+    rows: int
+    slow_calls: int
+    plan: Optional[List[str]] = None
+
+class SnapshotCreate(BaseModel):
+    compress: bool = SNAPSHOT_COMPRESS
+
+class SnapshotInfo(BaseModel):
+    name: str
+    size: int
+    created_at: str
+    compressed: bool
 
 class HealthResponse(BaseModel):
     status: str
@@ -52,393 +196,10 @@ def authenticate(credentials: HTTPBasicCredentials = Depends(security)):
     return credentials.username
 
 
-admin_html = """
-<!DOCTYPE html>
-<html lang="ru">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Админ-панель блога</title>
-    <style>
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }
-
-        body {
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen, Ubuntu, Cantarell, sans-serif;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-            padding: 20px;
-        }
-
-        .container {
-            max-width: 1200px;
-            margin: 0 auto;
-            background: white;
-            border-radius: 20px;
-            box-shadow: 0 20px 40px rgba(0,0,0,0.1);
-            overflow: hidden;
-        }
-
-        .header {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            padding: 30px;
-            text-align: center;
-        }
-
-        .header h1 {
-            font-size: 2.5em;
-            margin-bottom: 10px;
-        }
-
-        .content {
-            padding: 30px;
-        }
-
-        .section {
-            margin-bottom: 40px;
-            padding: 25px;
-            border-radius: 15px;
-            background: #f8f9fa;
-            border-left: 5px solid #667eea;
-        }
-
-        .section h2 {
-            color: #333;
-            margin-bottom: 20px;
-            font-size: 1.5em;
-        }
-
-        .form-group {
-            margin-bottom: 20px;
-        }
-
-        label {
-            display: block;
-            margin-bottom: 8px;
-            font-weight: 600;
-            color: #555;
-        }
-
-        input, textarea {
-            width: 100%;
-            padding: 12px 15px;
-            border: 2px solid #e9ecef;
-            border-radius: 10px;
-            font-size: 16px;
-            transition: border-color 0.3s ease;
-        }
-
-        input:focus, textarea:focus {
-            outline: none;
-            border-color: #667eea;
-        }
-
-        textarea {
-            min-height: 120px;
-            resize: vertical;
-        }
-
-        .btn {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            border: none;
-            padding: 12px 25px;
-            border-radius: 10px;
-            cursor: pointer;
-            font-size: 16px;
-            font-weight: 600;
-            transition: transform 0.2s ease;
-            margin-right: 10px;
-        }
-
-        .btn:hover {
-            transform: translateY(-2px);
-        }
-
-        .btn-danger {
-            background: linear-gradient(135deg, #ff6b6b 0%, #ee5a52 100%);
-        }
-
-        .posts-grid {
-            display: grid;
-            gap: 20px;
-            margin-top: 20px;
-        }
-
-        .post-card {
-            background: white;
-            border-radius: 15px;
-            padding: 20px;
-            border: 2px solid #e9ecef;
-            transition: transform 0.2s ease, box-shadow 0.2s ease;
-        }
-
-        .post-card:hover {
-            transform: translateY(-5px);
-            box-shadow: 0 10px 25px rgba(0,0,0,0.1);
-        }
-
-        .post-title {
-            font-size: 1.2em;
-            font-weight: bold;
-            color: #333;
-            margin-bottom: 10px;
-        }
-
-        .post-content {
-            color: #666;
-            margin-bottom: 15px;
-            max-height: 100px;
-            overflow: hidden;
-        }
-
-        .post-date {
-            font-size: 0.9em;
-            color: #999;
-            margin-bottom: 15px;
-        }
-
-        .post-actions {
-            display: flex;
-            gap: 10px;
-        }
-
-        .alert {
-            padding: 15px;
-            border-radius: 10px;
-            margin-bottom: 20px;
-            font-weight: 500;
-        }
-
-        .alert-success {
-            background: #d4edda;
-            color: #155724;
-            border: 1px solid #c3e6cb;
-        }
-
-        .alert-error {
-            background: #f8d7da;
-            color: #721c24;
-            border: 1px solid #f5c6cb;
-        }
-
-        .stats {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-            gap: 20px;
-            margin-bottom: 30px;
-        }
-
-        .stat-card {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            padding: 25px;
-            border-radius: 15px;
-            text-align: center;
-        }
-
-        .stat-number {
-            font-size: 2.5em;
-            font-weight: bold;
-        }
-
-        .stat-label {
-            margin-top: 10px;
-            opacity: 0.9;
-        }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h1>🚀 Админ-панель блога</h1>
-            <p>Управление постами для Telegram-бота</p>
-        </div>
-
-        <div class="content">
-            <div id="alert-container"></div>
-
-            <div class="stats">
-                <div class="stat-card">
-                    <div class="stat-number" id="total-posts">0</div>
-                    <div class="stat-label">Всего постов</div>
-                </div>
-            </div>
-
-            <div class="section">
-                <h2>➕ Создать новый пост</h2>
-                <form id="create-form">
-                    <div class="form-group">
-                        <label for="create-title">Заголовок:</label>
-                        <input type="text" id="create-title" required>
-                    </div>
-                    <div class="form-group">
-                        <label for="create-content">Содержимое:</label>
-                        <textarea id="create-content" required></textarea>
-                    </div>
-                    <button type="submit" class="btn">Создать пост</button>
-                </form>
-            </div>
-
-            <div class="section">
-                <h2>📝 Управление постами</h2>
-                <button onclick="loadPosts()" class="btn">Обновить список</button>
-                <div id="posts-container" class="posts-grid"></div>
-            </div>
-        </div>
-    </div>
-
-    <script>
-        const API_BASE = window.location.origin;
-
-        // Показать уведомление
-        function showAlert(message, type = 'success') {
-            const alertContainer = document.getElementById('alert-container');
-            const alert = document.createElement('div');
-            alert.className = `alert alert-${type}`;
-            alert.textContent = message;
-            alertContainer.innerHTML = '';
-            alertContainer.appendChild(alert);
-
-            setTimeout(() => {
-                alert.remove();
-            }, 5000);
-        }
-
-        // Загрузить посты
-        async function loadPosts() {
-            try {
-                const response = await fetch(`${API_BASE}/posts`);
-                const posts = await response.json();
-
-                document.getElementById('total-posts').textContent = posts.length;
-
-                const container = document.getElementById('posts-container');
-                container.innerHTML = '';
-
-                if (posts.length === 0) {
-                    container.innerHTML = '<p style="text-align: center; color: #666;">Нет постов для отображения</p>';
-                    return;
-                }
-
-                posts.forEach(post => {
-                    const postElement = document.createElement('div');
-                    postElement.className = 'post-card';
-                    postElement.innerHTML = `
-                        <div class="post-title">${post.title}</div>
-                        <div class="post-content">${post.content.substring(0, 150)}${post.content.length > 150 ? '...' : ''}</div>
-                        <div class="post-date">📅 ${new Date(post.created_at).toLocaleString('ru-RU')}</div>
-                        <div class="post-actions">
-                            <button class="btn" onclick="editPost(${post.id}, '${post.title.replace(/'/g, "\'")}', '${post.content.replace(/'/g, "\'")}')">Редактировать</button>
-                            <button class="btn btn-danger" onclick="deletePost(${post.id})">Удалить</button>
-                        </div>
-                    `;
-                    container.appendChild(postElement);
-                });
-            } catch (error) {
-                showAlert('Ошибка при загрузке постов: ' + error.message, 'error');
-            }
-        }
-
-        // Создать пост
-        document.getElementById('create-form').addEventListener('submit', async (e) => {
-            e.preventDefault();
-
-            const title = document.getElementById('create-title').value;
-            const content = document.getElementById('create-content').value;
-
-            try {
-                const response = await fetch(`${API_BASE}/posts`, {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json',
-                        'Authorization': 'Basic ' + btoa('admin:admin123')
-                    },
-                    body: JSON.stringify({ title, content })
-                });
-
-                if (response.ok) {
-                    showAlert('Пост успешно создан!');
-                    document.getElementById('create-form').reset();
-                    loadPosts();
-                } else {
-                    const error = await response.json();
-                    showAlert('Ошибка: ' + error.detail, 'error');
-                }
-            } catch (error) {
-                showAlert('Ошибка при создании поста: ' + error.message, 'error');
-            }
-        });
-
-        // Редактировать пост
-        function editPost(id, title, content) {
-            const newTitle = prompt('Новый заголовок:', title);
-            if (newTitle === null) return;
-
-            const newContent = prompt('Новое содержимое:', content);
-            if (newContent === null) return;
-
-            updatePost(id, newTitle, newContent);
-        }
-
-        // Обновить пост
-        async function updatePost(id, title, content) {
-            try {
-                const response = await fetch(`${API_BASE}/posts/${id}`, {
-                    method: 'PUT',
-                    headers: {
-                        'Content-Type': 'application/json',
-                        'Authorization': 'Basic ' + btoa('admin:admin123')
-                    },
-                    body: JSON.stringify({ title, content })
-                });
-
-                if (response.ok) {
-                    showAlert('Пост успешно обновлен!');
-                    loadPosts();
-                } else {
-                    const error = await response.json();
-                    showAlert('Ошибка: ' + error.detail, 'error');
-                }
-            } catch (error) {
-                showAlert('Ошибка при обновлении поста: ' + error.message, 'error');
-            }
-        }
-
-        // Удалить пост
-        async function deletePost(id) {
-            if (!confirm('Вы уверены, что хотите удалить этот пост?')) return;
-
-            try {
-                const response = await fetch(`${API_BASE}/posts/${id}`, {
-                    method: 'DELETE',
-                    headers: {
-                        'Authorization': 'Basic ' + btoa('admin:admin123')
-                    }
-                });
-
-                if (response.ok) {
-                    showAlert('Пост успешно удален!');
-                    loadPosts();
-                } else {
-                    const error = await response.json();
-                    showAlert('Ошибка: ' + error.detail, 'error');
-                }
-            } catch (error) {
-                showAlert('Ошибка при удалении поста: ' + error.message, 'error');
-            }
-        }
-
-        // Загрузить посты при старте
-        loadPosts();
-    </script>
-</body>
-</html>
-"""
+@lru_cache(maxsize=None)
+def get_admin_html() -> str:
+    with open(ADMIN_HTML_PATH, encoding="utf-8") as f:
+        return f.read()
 
 
 @app.get("/", response_class=JSONResponse)
@@ -453,11 +214,11 @@ async def root():
 
 @app.get("/admin", response_class=HTMLResponse)
 async def admin_panel():
-    return admin_html
+    return get_admin_html()
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
-    db_status = db.check_connection()
+    db_status = get_db().check_connection()
 
     if db_status:
         return HealthResponse(
@@ -470,64 +231,289 @@ async def health_check():
             detail="Проблемы с подключением к базе данных"
         )
 
+LOCAL_OFFSET = timedelta(hours=3)
+
+def to_local_time(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return value
+    return (datetime.fromisoformat(value) + LOCAL_OFFSET).isoformat()
+
+def serialize_post(post):
+    return {
+        "id": post.id,
+        "title": post.title,
+        "content": post.content,
+        "created_at": to_local_time(post.created_at),
+        "publish_at": to_local_time(post.publish_at),
+    }
+
+POSTS_CHUNK = 256
+
+def iter_posts_json(posts):
+    # Посты кодируются по одному и отдаются пачками: ни словари и модели pydantic на весь список,
+    # ни тело ответа целиком в памяти не собираются
+    yield b"["
+    for start in range(0, len(posts), POSTS_CHUNK):
+        chunk = ",".join(
+            json.dumps(serialize_post(post), ensure_ascii=False, separators=(",", ":"))
+            for post in posts[start:start + POSTS_CHUNK]
+        )
+        yield (chunk if start == 0 else "," + chunk).encode("utf-8")
+    yield b"]"
+
+def posts_response(posts) -> StreamingResponse:
+    # Статус 200 уходит до тела ответа: некорректные даты проверяются заранее,
+    # чтобы ошибка стала ответом 500, а не обрезанным JSON
+    for post in posts:
+        to_local_time(post.created_at)
+        to_local_time(post.publish_at)
+    return StreamingResponse(iter_posts_json(posts), media_type="application/json")
+
+def to_storage_time(value: Optional[datetime]) -> Optional[str]:
+    # Время без часового пояса считается местным (как в ответах API), в базе хранится UTC
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    else:
+        value = value - LOCAL_OFFSET
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
 @app.get("/posts", response_model=List[PostResponse])
 async def get_posts():
     try:
-        posts = db.get_all_posts()
-        for post in posts:
-            dt = datetime.fromisoformat(post["created_at"])
-            post["created_at"] = (dt + timedelta(hours=3)).isoformat()
-        return posts
+        return posts_response(get_db().get_all_posts())
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка получения постов: {str(e)}")
 
+@app.get("/posts/changes", response_model=ChangesResponse)
+async def get_post_changes(since: int = Query(0, ge=0), limit: int = Query(500, ge=1, le=5000)):
+    try:
+        result = get_db().get_changes(since, limit)
+        for change in result["changes"]:
+            if change["post"]:
+                change["post"] = serialize_post(change["post"])
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка получения изменений: {str(e)}")
+
 @app.get("/posts/{post_id}", response_model=PostResponse)
 async def get_post(post_id: int):
-    post = db.get_post_by_id(post_id)
+    post = get_db().get_post_by_id(post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Пост не найден")
-    return post
+    return serialize_post(post)
 
 @app.post("/posts", response_model=PostResponse)
 async def create_post(post: PostCreate, username: str = Depends(authenticate)):
     try:
-        post_id = db.add_post(post.title, post.content)
-        created_post = db.get_post_by_id(post_id)
-        return created_post
+        post_id = get_db().add_post(post.title, post.content, to_storage_time(post.publish_at))
+        created_post = get_db().get_post_by_id(post_id, include_unpublished=True)
+        get_scheduler().schedule(post_id, created_post.publish_at)
+        return serialize_post(created_post)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка создания поста: {str(e)}")
 
 @app.put("/posts/{post_id}", response_model=PostResponse)
 async def update_post(post_id: int, post: PostUpdate, username: str = Depends(authenticate)):
-    existing_post = db.get_post_by_id(post_id)
+    existing_post = get_db().get_post_by_id(post_id, include_unpublished=True)
     if not existing_post:
         raise HTTPException(status_code=404, detail="Пост не найден")
 
-    success = db.update_post(post_id, post.title, post.content)
+    success = get_db().update_post(post_id, post.title, post.content, to_storage_time(post.publish_at))
     if not success:
         raise HTTPException(status_code=500, detail="Ошибка обновления поста")
 
-    updated_post = db.get_post_by_id(post_id)
-    return updated_post
+    updated_post = get_db().get_post_by_id(post_id, include_unpublished=True)
+    get_scheduler().schedule(post_id, updated_post.publish_at)
+    return serialize_post(updated_post)
 
 @app.delete("/posts/{post_id}")
 async def delete_post(post_id: int, username: str = Depends(authenticate)):
-    existing_post = db.get_post_by_id(post_id)
+    existing_post = get_db().get_post_by_id(post_id, include_unpublished=True)
     if not existing_post:
         raise HTTPException(status_code=404, detail="Пост не найден")
 
-    success = db.delete_post(post_id)
+    success = get_db().delete_post(post_id)
     if not success:
         raise HTTPException(status_code=500, detail="Ошибка удаления поста")
 
+    get_scheduler().cancel(post_id)
     return {"message": "Пост успешно удален"}
 
-def main():
-    db.create_tables()
+def attachment_response(attachment):
+    return {**attachment, "url": f"/media/{attachment['hash']}"}
 
+@app.post("/posts/{post_id}/attachments", response_model=AttachmentResponse)
+async def upload_attachment(post_id: int, file: UploadFile = File(...), username: str = Depends(authenticate)):
+    if not get_db().get_post_by_id(post_id, include_unpublished=True):
+        raise HTTPException(status_code=404, detail="Пост не найден")
+
+    from media import MediaTooLarge
+    try:
+        blob_hash, size = await get_media().save(file.read)
+    except MediaTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка сохранения файла: {str(e)}")
+
+    content_type = file.content_type or "application/octet-stream"
+    filename = file.filename or blob_hash
+    attachment_id = get_db().add_attachment(post_id, blob_hash, size, content_type, filename)
+
+    # Файл уже лежал на диске, но очистка медиа удалила его до того, как появилось вложение
+    if not get_media().exists(blob_hash):
+        await file.seek(0)
+        await get_media().save(file.read)
+    return attachment_response({
+        "id": attachment_id,
+        "post_id": post_id,
+        "hash": blob_hash,
+        "filename": filename,
+        "content_type": content_type,
+        "size": size,
+    })
+
+@app.get("/posts/{post_id}/attachments", response_model=List[AttachmentResponse])
+async def get_attachments(post_id: int):
+    if not get_db().get_post_by_id(post_id):
+        raise HTTPException(status_code=404, detail="Пост не найден")
+    return [attachment_response(attachment) for attachment in get_db().get_attachments(post_id)]
+
+@app.delete("/posts/{post_id}/attachments/{attachment_id}")
+async def delete_attachment(post_id: int, attachment_id: int, username: str = Depends(authenticate)):
+    if not get_db().delete_attachment(post_id, attachment_id):
+        raise HTTPException(status_code=404, detail="Вложение не найдено")
+    return {"message": "Вложение удалено"}
+
+@app.get("/media/{blob_hash}")
+async def get_media_file(blob_hash: str):
+    path = get_media().open_path(blob_hash)
+    blob = get_db().get_blob(blob_hash) if path else None
+    if not blob:
+        raise HTTPException(status_code=404, detail="Файл не найден")
+
+    # Содержимое по адресу никогда не меняется, поэтому его можно кешировать навсегда
+    return FileResponse(
+        path,
+        media_type=blob["content_type"],
+        headers={"Cache-Control": "public, max-age=31536000, immutable"}
+    )
+
+@app.get("/admin/posts", response_model=List[PostResponse])
+async def get_admin_posts(username: str = Depends(authenticate)):
+    try:
+        return posts_response(get_db().get_all_posts(include_unpublished=True))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка получения постов: {str(e)}")
+
+@app.get("/admin/scheduled", response_model=List[ScheduledPublication])
+async def get_scheduled(username: str = Depends(authenticate)):
+    return [
+        {**publication, "publish_at": to_local_time(publication["publish_at"])}
+        for publication in get_scheduler().pending()
+    ]
+
+@app.get("/admin/query-stats", response_model=List[QueryStats])
+async def get_query_stats(username: str = Depends(authenticate)):
+    return get_db().get_query_stats()
+
+@app.delete("/admin/query-stats")
+async def reset_query_stats(username: str = Depends(authenticate)):
+    get_db().reset_query_stats()
+    return {"message": "Статистика запросов сброшена"}
+
+def require_sqlite():
+    if not uses_sqlite():
+        raise HTTPException(status_code=404, detail="Хранилище не использует SQLite")
+
+@app.get("/admin/maintenance")
+async def get_maintenance_stats(username: str = Depends(authenticate)):
+    require_sqlite()
+    return get_maintenance().stats
+
+@app.post("/admin/maintenance")
+async def run_maintenance(username: str = Depends(authenticate)):
+    require_sqlite()
+    try:
+        return await asyncio.to_thread(get_maintenance().run_once, True)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка обслуживания базы: {str(e)}")
+
+@app.get("/admin/snapshots", response_model=List[SnapshotInfo])
+async def get_db_snapshots(username: str = Depends(authenticate)):
+    require_sqlite()
+    from snapshots import list_snapshots
+    return list_snapshots(DATABASE_PATH, SNAPSHOT_DIR)
+
+@app.post("/admin/snapshots")
+async def create_db_snapshot(params: SnapshotCreate, username: str = Depends(authenticate)):
+    require_sqlite()
+    from snapshots import create_snapshot
+    try:
+        return await asyncio.to_thread(
+            create_snapshot, DATABASE_PATH, SNAPSHOT_DIR, params.compress, SNAPSHOT_KEEP, SNAPSHOT_STEP_PAGES
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка создания снимка: {str(e)}")
+
+@app.post("/admin/snapshots/{name}/restore")
+async def restore_db_snapshot(name: str, username: str = Depends(authenticate)):
+    require_sqlite()
+    from snapshots import restore_snapshot
+    try:
+        await asyncio.to_thread(restore_snapshot, DATABASE_PATH, SNAPSHOT_DIR, name)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка восстановления снимка: {str(e)}")
+
+    # В старых снимках может не быть таблиц и колонок, добавленных позже
+    get_db().create_tables()
+    get_scheduler().reload()
+    return {"message": f"База восстановлена из снимка {name}"}
+
+def require_profiling():
+    if not DEBUG_PROFILING:
+        raise HTTPException(status_code=404, detail="Профилирование отключено")
+
+@app.post("/debug/profile")
+async def start_profile(params: ProfileStart, username: str = Depends(authenticate)):
+    require_profiling()
+    try:
+        profiler.start(params.mode, params.requests, params.seconds, params.interval)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return profiler.status()
+
+@app.get("/debug/profile")
+async def get_profile(output_format: str = Query("pstats", alias="format", pattern="^(pstats|collapsed)$"),
+                      username: str = Depends(authenticate)):
+    require_profiling()
+    status = profiler.status()
+    if status["active"] or not status["has_report"]:
+        return status
+
+    report = profiler.report(output_format)
+    if report is None:
+        raise HTTPException(status_code=400, detail=f"Формат {output_format} недоступен для режима {profiler.mode}")
+    return PlainTextResponse(report)
+
+@app.delete("/debug/profile")
+async def stop_profile(username: str = Depends(authenticate)):
+    require_profiling()
+    profiler.stop()
+    return profiler.status()
+
+def main():
+    import uvicorn
 
     uvicorn.run(
-        "api:app",
+        app,
         host=API_HOST,
         port=API_PORT,
         reload=False,
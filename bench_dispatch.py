@@ -0,0 +1,77 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+
+from dispatch import UpdateDispatcher
+
+
+async def replay(updates: int, chats: int, workers: int, max_pending: int,
+                 handler_ms: float, slow_chat_ms: float, seed: int):
+    rng = random.Random(seed)
+    dispatcher = UpdateDispatcher(workers=workers, max_pending=max_pending)
+    dispatcher.start()
+
+    handled = defaultdict(list)
+    sent = defaultdict(int)
+    total_work = 0.0
+
+    async def handle(chat_id: int, seq: int, delay: float):
+        await asyncio.sleep(delay)
+        handled[chat_id].append(seq)
+
+    # Активность чатов распределена по Ципфу; один из заметных чатов обрабатывается медленно
+    weights = [1 / (rank + 1) ** 0.8 for rank in range(chats)]
+    slow_chat = min(10, chats - 1)
+
+    started = time.perf_counter()
+    for _ in range(updates):
+        chat_id = rng.choices(range(chats), weights)[0]
+        delay = (slow_chat_ms if chat_id == slow_chat else rng.uniform(0, 2 * handler_ms)) / 1000
+        total_work += delay
+        seq = sent[chat_id]
+        sent[chat_id] += 1
+        await dispatcher.submit(chat_id, lambda c=chat_id, s=seq, d=delay: handle(c, s, d))
+
+    await dispatcher.stop()
+    elapsed = time.perf_counter() - started
+
+    out_of_order = [
+        chat_id for chat_id, seqs in handled.items() if seqs != list(range(sent[chat_id]))
+    ]
+    return {
+        "updates": updates,
+        "chats": len(sent),
+        "elapsed_s": elapsed,
+        "sequential_s": total_work,
+        "speedup": total_work / elapsed if elapsed else 0.0,
+        "ordered": not out_of_order,
+        "out_of_order_chats": out_of_order,
+        "metrics": dispatcher.metrics(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Воспроизведение синтетического потока обновлений бота")
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--queue", type=int, default=100)
+    parser.add_argument("--handler-ms", type=float, default=5.0)
+    parser.add_argument("--slow-chat-ms", type=float, default=50.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    result = asyncio.run(replay(
+        args.updates, args.chats, args.workers, args.queue,
+        args.handler_ms, args.slow_chat_ms, args.seed
+    ))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if not result["ordered"]:
+        raise SystemExit("Нарушен порядок обработки внутри чата")
+
+
+if __name__ == "__main__":
+    main()
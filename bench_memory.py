@@ -0,0 +1,108 @@
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+
+from database import DatabaseManager
+
+
+def fill_database(db_path: str, posts: int, content_size: int):
+    DatabaseManager(db_path).create_tables()
+    content = "Текст поста. " * (content_size // 13 + 1)
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany(
+            "INSERT INTO posts (title, content, created_at, publish_at) "
+            "VALUES (?, ?, datetime('now', ?), datetime('now', ?))",
+            (
+                (f"Пост номер {i}", content[:content_size], f"-{i} seconds", f"-{i} seconds")
+                for i in range(posts)
+            )
+        )
+
+
+def list_as_dicts(db_path: str) -> int:
+    # Прежний путь: sqlite3.Row -> dict -> локализация на месте -> модели pydantic -> JSON
+    from api import LOCAL_OFFSET, PostResponse
+    from datetime import datetime
+
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute(
+            "SELECT * FROM posts WHERE publish_at <= CURRENT_TIMESTAMP ORDER BY created_at DESC"
+        ).fetchall()
+    finally:
+        conn.close()
+
+    posts = [dict(row) for row in rows]
+    for post in posts:
+        for field in ("created_at", "publish_at"):
+            if post.get(field):
+                post[field] = (datetime.fromisoformat(post[field]) + LOCAL_OFFSET).isoformat()
+    models = [PostResponse(**post) for post in posts]
+    content = [model.model_dump(mode="json") for model in models]
+    return len(json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def list_as_records(db_path: str) -> int:
+    # Тело отдается пачками, как его отправляет StreamingResponse; храним только размер
+    from api import posts_response
+    response = posts_response(DatabaseManager(db_path).get_all_posts())
+
+    async def consume() -> int:
+        return sum([len(chunk) async for chunk in response.body_iterator])
+
+    return asyncio.run(consume())
+
+
+def measure(name: str, list_posts, db_path: str):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = list_posts(db_path)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "mode": name,
+        "peak_mb": peak / 1024 / 1024,
+        "elapsed_s": elapsed,
+        "response_mb": size / 1024 / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пиковая память при выдаче списка постов")
+    parser.add_argument("--posts", type=int, default=100_000)
+    parser.add_argument("--content-size", type=int, default=200)
+    args = parser.parse_args()
+
+    # Модули импортируются заранее, чтобы их память не попала в замер
+    import api  # noqa: F401
+
+    # Выборка 100k строк ожидаемо попадает в лог медленных запросов
+    logging.disable(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "bench.db")
+        fill_database(db_path, args.posts, args.content_size)
+
+        before = measure("dicts", list_as_dicts, db_path)
+        after = measure("records", list_as_records, db_path)
+
+    print(json.dumps({
+        "posts": args.posts,
+        "content_size": args.content_size,
+        "results": [before, after],
+        "peak_ratio": before["peak_mb"] / after["peak_mb"] if after["peak_mb"] else 0.0,
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Первое обновление для бота: /posts через фиктивную сессию, без обращений к Telegram
+BOT_FIRST_UPDATE = """
+import asyncio
+import bot
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.types import Update
+
+
+class NullSession(BaseSession):
+    async def close(self):
+        pass
+
+    async def make_request(self, bot, method, timeout=None):
+        return None
+
+    async def stream_content(self, *args, **kwargs):
+        if False:
+            yield b""
+
+
+async def first_update():
+    telegram_bot = Bot(token="42:BENCHMARK", session=NullSession())
+    bot.get_db().create_tables()
+    update = Update.model_validate({
+        "update_id": 1,
+        "message": {
+            "message_id": 1,
+            "date": 0,
+            "chat": {"id": 1, "type": "private"},
+            "from": {"id": 1, "is_bot": False, "first_name": "bench"},
+            "text": "/posts",
+        },
+    }, context={"bot": telegram_bot})
+    await bot.dp.feed_update(telegram_bot, update)
+
+
+asyncio.run(first_update())
+print("served", flush=True)
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def import_time(module: str, env, top: int):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Не удалось импортировать {module}: {result.stderr.strip().splitlines()[-1]}")
+
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            modules.append((int(parts[1]), int(parts[0]), parts[2].strip()))
+        except ValueError:
+            continue
+
+    total_us = next((cumulative for cumulative, _, name in modules if name == module), 0)
+    slowest = sorted(modules, reverse=True)[:top]
+    return {
+        "total_ms": total_us / 1000,
+        "slowest": [
+            {"module": name, "cumulative_ms": cumulative / 1000, "self_ms": own / 1000}
+            for cumulative, own, name in slowest
+        ],
+    }
+
+
+def api_first_request(env, timeout: float) -> float:
+    port = free_port()
+    env = {**env, "API_HOST": "127.0.0.1", "API_PORT": str(port)}
+
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "api.py"], cwd=ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1):
+                    return (time.perf_counter() - started) * 1000
+            except OSError:
+                if process.poll() is not None:
+                    raise RuntimeError("API завершился до первого ответа")
+                time.sleep(0.01)
+        raise RuntimeError("API не ответил за отведенное время")
+    finally:
+        process.terminate()
+        process.wait(timeout=5)
+
+
+def bot_first_update(env, timeout: float) -> float:
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", BOT_FIRST_UPDATE], cwd=ROOT, env=env,
+        capture_output=True, text=True, timeout=timeout
+    )
+    if "served" not in result.stdout:
+        raise RuntimeError(f"Бот не обработал обновление: {result.stderr.strip()[-500:]}")
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер времени запуска api.py и bot.py")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--history", default=os.path.join(ROOT, "bench_startup.jsonl"))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            "BOT_TOKEN": "42:BENCHMARK",
+            "DATABASE_PATH": os.path.join(tmp, "bench.db"),
+        }
+
+        report = {"timestamp": datetime.now().isoformat(timespec="seconds"), "runs": args.runs}
+        for module in ("api", "bot"):
+            report[f"{module}_import"] = import_time(module, env, args.top)
+
+        api_runs = [api_first_request(env, args.timeout) for _ in range(args.runs)]
+        bot_runs = [bot_first_update(env, args.timeout) for _ in range(args.runs)]
+        report["api_first_request_ms"] = min(api_runs)
+        report["bot_first_update_ms"] = min(bot_runs)
+
+    previous = None
+    if os.path.exists(args.history):
+        with open(args.history, encoding="utf-8") as f:
+            lines = [line for line in f if line.strip()]
+        if lines:
+            previous = json.loads(lines[-1])
+
+    for module in ("api", "bot"):
+        print(f"import {module}: {report[f'{module}_import']['total_ms']:.1f} мс")
+        for item in report[f"{module}_import"]["slowest"]:
+            print(f"    {item['cumulative_ms']:8.1f} мс  {item['module']}")
+
+    for key, title in (("api_first_request_ms", "API: первый ответ /health"),
+                       ("bot_first_update_ms", "Бот: первое обработанное обновление")):
+        line = f"{title}: {report[key]:.1f} мс"
+        if previous and key in previous:
+            line += f" (было {previous[key]:.1f} мс)"
+        print(line)
+
+    with open(args.history, "a", encoding="utf-8") as f:
+        f.write(json.dumps(report, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
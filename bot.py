@@ -1,32 +1,144 @@
 import asyncio
 import logging
-from aiogram import Bot, Dispatcher, types, F
+import signal
+import time
+from functools import lru_cache
+from aiogram import Bot, Dispatcher, BaseMiddleware, types, F
+from aiogram.dispatcher.middlewares.error import ErrorsMiddleware
 from aiogram.filters import Command
-from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.methods import TelegramMethod
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from config import BOT_TOKEN
-from database import DatabaseManager
+from config import (
+    BOT_TOKEN, DATABASE_PATH, STORAGE_BACKEND, STORAGE_WRITE_THROUGH, STORAGE_SYNC_INTERVAL,
+    CHANGES_RETENTION_DAYS, SLOW_QUERY_MS, PROFILE_DIR, BOT_PROFILE_MODE, BOT_PROFILE_UPDATES,
+    BOT_WORKERS, BOT_QUEUE_SIZE, BOT_METRICS_INTERVAL, BOT_SHUTDOWN_TIMEOUT, MEDIA_DIR, MEDIA_MAX_BYTES
+)
+from dispatch import UpdateDispatcher
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-bot = Bot(token=BOT_TOKEN)
 dp = Dispatcher()
-db = DatabaseManager()
+
+
+# Тяжелые объекты создаются при первом обращении, а не при импорте модуля
+@lru_cache(maxsize=None)
+def get_db():
+    from storage import create_storage
+    return create_storage(
+        STORAGE_BACKEND, DATABASE_PATH, STORAGE_WRITE_THROUGH, STORAGE_SYNC_INTERVAL,
+        CHANGES_RETENTION_DAYS, SLOW_QUERY_MS
+    )
+
+
+@lru_cache(maxsize=None)
+def get_media():
+    from media import MediaStore
+    return MediaStore(MEDIA_DIR, MEDIA_MAX_BYTES)
+
+
+@lru_cache(maxsize=None)
+def get_profiler():
+    from profiler import Profiler
+    return Profiler()
+
+
+class ProfilingMiddleware(BaseMiddleware):
+    async def __call__(self, handler, event, data):
+        profiler = get_profiler()
+        try:
+            return await handler(event, data)
+        finally:
+            profiler.request_finished()
+            if not profiler.active:
+                finish_profiling()
+
+
+profiling_middleware = ProfilingMiddleware()
+
+
+def finish_profiling():
+    # Middleware снимается сразу после сессии: без профилирования цепочка dp не меняется.
+    # Обновления обрабатываются параллельно, и конец сессии видят несколько из них:
+    # отчет сохраняет только то, которое сняло middleware
+    if profiling_middleware not in dp.update.outer_middleware:
+        return
+    dp.update.outer_middleware.unregister(profiling_middleware)
+
+    path = get_profiler().dump(PROFILE_DIR, "bot")
+    if path:
+        logger.info(f"Профиль бота сохранен: {path}")
+
+
+def toggle_profiling():
+    profiler = get_profiler()
+    if profiler.active:
+        profiler.stop()
+        finish_profiling()
+        return
+
+    profiler.start(BOT_PROFILE_MODE, requests=BOT_PROFILE_UPDATES)
+    dp.update.outer_middleware(profiling_middleware)
+    logger.info(f"Профилирование бота включено на {BOT_PROFILE_UPDATES} обновлений")
+
+class ChatOrderingMiddleware(BaseMiddleware):
+    # Обновление уходит в очередь своего чата; polling ждет только при переполнении очереди.
+    # feed_update завершается до запуска обработчика, поэтому ошибки (dp.errors), метод, возвращенный
+    # обработчиком, и время обработки обслуживаются здесь. "Duration" в логе aiogram - это только
+    # постановка в очередь; реальные задержки - в метриках UpdateDispatcher
+    def __init__(self, dispatcher: UpdateDispatcher, router: Dispatcher):
+        self.dispatcher = dispatcher
+        self.router = router
+        self.errors = ErrorsMiddleware(router)
+
+    async def __call__(self, handler, event, data):
+        chat = data.get("event_chat")
+        user = data.get("event_from_user")
+        if chat is not None:
+            chat_key = ("chat", chat.id)
+        elif user is not None:
+            chat_key = ("user", user.id)
+        else:
+            chat_key = ("update", event.update_id)
+
+        await self.dispatcher.submit(chat_key, lambda: self.process(handler, event, data))
+
+    async def process(self, handler, event, data):
+        started = time.perf_counter()
+        try:
+            response = await self.errors(handler, event, data)
+            if isinstance(response, TelegramMethod):
+                await self.router.silent_call_request(bot=data["bot"], result=response)
+        finally:
+            logger.debug(
+                f"Обновление {event.update_id} обработано воркером за "
+                f"{(time.perf_counter() - started) * 1000:.0f} мс"
+            )
+
+
+async def log_dispatch_metrics(dispatcher: UpdateDispatcher):
+    processed = 0
+    while True:
+        await asyncio.sleep(BOT_METRICS_INTERVAL)
+        metrics = dispatcher.metrics()
+        if metrics["processed"] != processed:
+            processed = metrics["processed"]
+            logger.info(f"Очередь обновлений (задержка - от постановки в очередь до конца обработки): {metrics}")
 
 def create_posts_keyboard(posts):
     builder = InlineKeyboardBuilder()
 
     for post in posts:
-        title = post['title']
+        title = post.title
         if len(title) > 30:
             title = title[:27] + "..."
 
         builder.button(
             text=title,
-            callback_data=f"post_{post['id']}"
+            callback_data=f"post_{post.id}"
         )
 
     builder.adjust(1)
@@ -45,7 +157,7 @@ async def cmd_start(message: Message):
 @dp.message(Command("posts"))
 async def cmd_posts(message: Message):
     try:
-        posts = db.get_all_posts()
+        posts = await asyncio.to_thread(get_db().get_all_posts)
 
         if not posts:
             await message.answer(
@@ -71,7 +183,7 @@ async def cmd_posts(message: Message):
 async def show_post(callback: CallbackQuery):
     try:
         post_id = int(callback.data.split("_")[1])
-        post = db.get_post_by_id(post_id)
+        post = await asyncio.to_thread(get_db().get_post_by_id, post_id)
 
         if not post:
             await callback.message.edit_text(
@@ -80,7 +192,7 @@ async def show_post(callback: CallbackQuery):
             return
 
         # Форматируем дату
-        created_at = post['created_at']
+        created_at = post.created_at
         if isinstance(created_at, str):
             try:
                 from datetime import datetime
@@ -97,8 +209,8 @@ async def show_post(callback: CallbackQuery):
 
         # Формируем текст поста
         post_text = (
-            f"**{post['title']}**\n\n"
-            f"{post['content']}\n\n"
+            f"**{post.title}**\n\n"
+            f"{post.content}\n\n"
             f"Дата создания: {formatted_date}"
         )
 
@@ -108,6 +220,14 @@ async def show_post(callback: CallbackQuery):
             parse_mode="Markdown"
         )
 
+        # Пост уже показан: ошибка одного вложения не должна превращаться в ошибку всего поста
+        attachments = await asyncio.to_thread(get_db().get_attachments, post_id)
+        for attachment in attachments:
+            try:
+                await send_attachment(callback.message, attachment)
+            except Exception as e:
+                logger.error(f"Ошибка отправки вложения {attachment['id']} поста {post_id}: {e}")
+
     except Exception as e:
         logger.error(f"Ошибка при показе поста: {e}")
         await callback.answer(
@@ -115,10 +235,40 @@ async def show_post(callback: CallbackQuery):
             show_alert=True
         )
 
+# sendPhoto принимает только такие изображения и не больше 10 МБ; остальное уходит документом
+PHOTO_TYPES = {"image/jpeg", "image/png", "image/webp"}
+PHOTO_MAX_BYTES = 10 * 1024 * 1024
+
+
+async def send_attachment(message: Message, attachment):
+    # Файл загружается в Telegram один раз, дальше отправляется по сохраненному file_id
+    is_photo = attachment['content_type'] in PHOTO_TYPES and attachment['size'] <= PHOTO_MAX_BYTES
+    file_id = attachment.get('telegram_file_id')
+    if file_id:
+        if is_photo:
+            await message.answer_photo(file_id)
+        else:
+            await message.answer_document(file_id)
+        return
+
+    path = get_media().open_path(attachment['hash'])
+    if path is None:
+        logger.warning(f"Файл вложения {attachment['hash']} не найден в хранилище")
+        return
+
+    upload = FSInputFile(path, filename=attachment['filename'])
+    if is_photo:
+        sent = await message.answer_photo(upload)
+        file_id = sent.photo[-1].file_id
+    else:
+        sent = await message.answer_document(upload)
+        file_id = sent.document.file_id
+    await asyncio.to_thread(get_db().set_telegram_file_id, attachment['hash'], file_id)
+
 @dp.callback_query(F.data == "back_to_posts")
 async def back_to_posts(callback: CallbackQuery):
     try:
-        posts = db.get_all_posts()
+        posts = await asyncio.to_thread(get_db().get_all_posts)
 
         if not posts:
             await callback.message.edit_text(
@@ -150,16 +300,35 @@ async def handle_unknown_message(message: Message):
     )
 
 async def main():
+    if BOT_TOKEN == 'YOUR_BOT_TOKEN_HERE':
+        logger.error("Не установлен токен бота!")
+        return
+
+    bot = Bot(token=BOT_TOKEN)
+    dispatcher = UpdateDispatcher(workers=BOT_WORKERS, max_pending=BOT_QUEUE_SIZE)
+    metrics_task = None
     try:
-        db.create_tables()
+        get_db().create_tables()
         logger.info("База данных инициализирована")
 
+        # kill -USR1 <pid> включает/выключает профилирование обработки обновлений
+        if hasattr(signal, "SIGUSR1"):
+            asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, toggle_profiling)
+
+        dispatcher.start()
+        dp.update.outer_middleware(ChatOrderingMiddleware(dispatcher, dp))
+        metrics_task = asyncio.create_task(log_dispatch_metrics(dispatcher))
+
         logger.info("Запуск Telegram бота...")
-        await dp.start_polling(bot)
+        # Параллельность обеспечивает UpdateDispatcher, поэтому aiogram не создает задачу на каждое обновление
+        await dp.start_polling(bot, handle_as_tasks=False)
 
     except Exception as e:
         logger.error(f"Ошибка при запуске бота: {e}")
     finally:
+        if metrics_task is not None:
+            metrics_task.cancel()
+        await dispatcher.stop(timeout=BOT_SHUTDOWN_TIMEOUT)
         await bot.session.close()
 
 
@@ -10,6 +10,22 @@ API_PORT = int(os.getenv('API_PORT', '8000'))
 
 
 DATABASE_PATH = os.getenv('DATABASE_PATH', 'blog.db')
+# sqlite - только SQLite; memory - индексы в памяти (STORAGE_WRITE_THROUGH=1 - с записью в SQLite)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'sqlite')
+STORAGE_WRITE_THROUGH = os.getenv('STORAGE_WRITE_THROUGH', '1') == '1'
+STORAGE_SYNC_INTERVAL = float(os.getenv('STORAGE_SYNC_INTERVAL', '1'))
+CHANGES_RETENTION_DAYS = int(os.getenv('CHANGES_RETENTION_DAYS', '30'))
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '100'))
+MAINTENANCE_ENABLED = os.getenv('MAINTENANCE_ENABLED', '1') == '1'
+MAINTENANCE_INTERVAL = float(os.getenv('MAINTENANCE_INTERVAL', '3600'))
+MAINTENANCE_IDLE_SECONDS = float(os.getenv('MAINTENANCE_IDLE_SECONDS', '30'))
+MAINTENANCE_VACUUM_PAGES = int(os.getenv('MAINTENANCE_VACUUM_PAGES', '64'))
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', 'snapshots')
+SNAPSHOT_KEEP = int(os.getenv('SNAPSHOT_KEEP', '7'))
+SNAPSHOT_COMPRESS = os.getenv('SNAPSHOT_COMPRESS', '1') == '1'
+SNAPSHOT_STEP_PAGES = int(os.getenv('SNAPSHOT_STEP_PAGES', '64'))
+MEDIA_DIR = os.getenv('MEDIA_DIR', 'media')
+MEDIA_MAX_BYTES = int(os.getenv('MEDIA_MAX_BYTES', str(50 * 1024 * 1024)))
 
 
 ADMIN_USERNAME = os.getenv('ADMIN_USERNAME', 'admin')
@@ -19,5 +35,13 @@ ADMIN_PASSWORD = os.getenv('ADMIN_PASSWORD', 'admin123')
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 
 
-if BOT_TOKEN == 'YOUR_BOT_TOKEN_HERE':
-    print("Не установлен токен бота!")
\ No newline at end of file
+DEBUG_PROFILING = os.getenv('DEBUG_PROFILING', '0') == '1'
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+BOT_PROFILE_MODE = os.getenv('BOT_PROFILE_MODE', 'cprofile')
+BOT_PROFILE_UPDATES = int(os.getenv('BOT_PROFILE_UPDATES', '100'))
+
+
+BOT_WORKERS = int(os.getenv('BOT_WORKERS', '8'))
+BOT_QUEUE_SIZE = int(os.getenv('BOT_QUEUE_SIZE', '1000'))
+BOT_METRICS_INTERVAL = float(os.getenv('BOT_METRICS_INTERVAL', '60'))
+BOT_SHUTDOWN_TIMEOUT = float(os.getenv('BOT_SHUTDOWN_TIMEOUT', '30'))
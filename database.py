@@ -1,14 +1,42 @@
 import sqlite3
 import asyncio
+import logging
+import sys
 import threading
+import time
 from contextlib import contextmanager
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, NamedTuple, Optional
 from datetime import datetime
 
+
+logger = logging.getLogger(__name__)
+
+
+class Post(NamedTuple):
+    id: int
+    title: str
+    content: str
+    created_at: str
+    publish_at: Optional[str]
+
+
+POST_COLUMNS = ", ".join(Post._fields)
+
+
+def post_row(cursor, row) -> Post:
+    # Строка сразу собирается в кортеж, без промежуточных sqlite3.Row и dict
+    return Post._make(row)
+
+
 class DatabaseManager:
-    def __init__(self, db_path: str = "blog.db"):
+    def __init__(self, db_path: str = "blog.db", changes_retention_days: int = 30,
+                 slow_query_ms: float = 100.0):
         self.db_path = db_path
+        self.changes_retention_days = changes_retention_days
+        self.slow_query_ms = slow_query_ms
         self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._query_stats: Dict[str, Dict[str, Any]] = {}
 
     @contextmanager
     def get_connection(self):
@@ -25,70 +53,480 @@ class DatabaseManager:
             if conn:
                 conn.close()
 
+    def _execute(self, cursor, sql: str, params: tuple = (), fetch: Optional[str] = None):
+        started = time.perf_counter()
+        cursor.execute(sql, params)
+        if fetch == "all":
+            result = cursor.fetchall()
+            rows = len(result)
+        elif fetch == "one":
+            result = cursor.fetchone()
+            rows = 1 if result else 0
+        else:
+            result = None
+            rows = cursor.rowcount
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        self._record_query(cursor, sql, params, elapsed_ms, rows)
+        return result
+
+    def _record_query(self, cursor, sql: str, params: tuple, elapsed_ms: float, rows: int):
+        statement = " ".join(sql.split())
+
+        # Публичный метод менеджера, из которого пришел запрос (get_all_posts, update_post, ...)
+        frame = sys._getframe(2)
+        while frame is not None and frame.f_code.co_name.startswith("_"):
+            frame = frame.f_back
+        caller = frame.f_code.co_name if frame is not None else "?"
+
+        slow = elapsed_ms >= self.slow_query_ms
+        plan = None
+        if slow:
+            try:
+                plan = [
+                    row[-1] for row in
+                    cursor.connection.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+                ]
+            except sqlite3.Error:
+                plan = []
+            logger.warning(
+                f"Медленный запрос ({elapsed_ms:.1f} мс, строк: {rows}) из {caller}: {statement} | "
+                f"параметры: {tuple(type(p).__name__ for p in params)} | план: {'; '.join(plan)}"
+            )
+
+        with self._stats_lock:
+            stats = self._query_stats.get(statement)
+            if stats is None:
+                stats = self._query_stats[statement] = {
+                    "statement": statement,
+                    "callers": set(),
+                    "calls": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "rows": 0,
+                    "slow_calls": 0,
+                    "plan": None,
+                }
+            stats["callers"].add(caller)
+            stats["calls"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            stats["rows"] += max(rows, 0)
+            if slow:
+                stats["slow_calls"] += 1
+                stats["plan"] = plan
+
+    def get_query_stats(self) -> List[Dict[str, Any]]:
+        with self._stats_lock:
+            result = [
+                {
+                    **stats,
+                    "callers": sorted(stats["callers"]),
+                    "avg_ms": stats["total_ms"] / stats["calls"],
+                }
+                for stats in self._query_stats.values()
+            ]
+        result.sort(key=lambda stats: stats["total_ms"], reverse=True)
+        return result
+
+    def reset_query_stats(self):
+        with self._stats_lock:
+            self._query_stats.clear()
+
     def create_tables(self):
         with self.get_connection() as conn:
             cursor = conn.cursor()
 
-            cursor.execute("""
+            # Для новой базы: освобожденные страницы возвращаются через PRAGMA incremental_vacuum,
+            # а WAL позволяет читать во время записи и обслуживания
+            self._execute(cursor, "PRAGMA auto_vacuum = INCREMENTAL")
+            self._execute(cursor, "PRAGMA journal_mode = WAL", fetch="one")
+
+            self._execute(cursor, """
                 CREATE TABLE IF NOT EXISTS posts (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     title TEXT NOT NULL,
                     content TEXT NOT NULL,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    publish_at DATETIME,
+                    published INTEGER NOT NULL DEFAULT 1
+                )
+            """)
+
+            # Базы, созданные до появления отложенной публикации
+            columns = self._execute(cursor, "PRAGMA table_info(posts)", fetch="all")
+            columns = {column["name"] for column in columns}
+            if "publish_at" not in columns:
+                self._execute(cursor, "ALTER TABLE posts ADD COLUMN publish_at DATETIME")
+                self._execute(cursor, "UPDATE posts SET publish_at = created_at WHERE publish_at IS NULL")
+
+            # published = 0 - время публикации еще не обработано планировщиком (хуки, запись в журнал)
+            if "published" not in columns:
+                self._execute(cursor, "ALTER TABLE posts ADD COLUMN published INTEGER NOT NULL DEFAULT 1")
+                self._execute(cursor, "UPDATE posts SET published = 0 WHERE publish_at > CURRENT_TIMESTAMP")
+
+            self._execute(
+                cursor,
+                "CREATE INDEX IF NOT EXISTS idx_posts_publish_at ON posts (publish_at)"
+            )
+            self._execute(
+                cursor,
+                "CREATE INDEX IF NOT EXISTS idx_posts_unpublished ON posts (publish_at) WHERE published = 0"
+            )
+
+            # Список постов читается по этому индексу уже в нужном порядке (id - это rowid в конце ключа)
+            self._execute(
+                cursor,
+                "CREATE INDEX IF NOT EXISTS idx_posts_created_at ON posts (created_at, id)"
+            )
+
+            # Журнал изменений: по одной записи на пост, версия растет при каждой записи
+            self._execute(cursor, """
+                CREATE TABLE IF NOT EXISTS post_changes (
+                    version INTEGER PRIMARY KEY AUTOINCREMENT,
+                    post_id INTEGER NOT NULL UNIQUE,
+                    op TEXT NOT NULL,
+                    changed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            # Сжатие при каждом удалении ищет старые надгробия: без индекса это полный проход по журналу
+            self._execute(
+                cursor,
+                "CREATE INDEX IF NOT EXISTS idx_post_changes_op_changed_at ON post_changes (op, changed_at)"
+            )
+
+            self._execute(cursor, """
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                )
+            """)
+
+            # Файлы хранятся на диске по SHA-256 содержимого; здесь только метаданные
+            self._execute(cursor, """
+                CREATE TABLE IF NOT EXISTS blobs (
+                    hash TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    content_type TEXT NOT NULL,
+                    telegram_file_id TEXT,
                     created_at DATETIME DEFAULT CURRENT_TIMESTAMP
                 )
             """)
 
+            self._execute(cursor, """
+                CREATE TABLE IF NOT EXISTS post_attachments (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    post_id INTEGER NOT NULL,
+                    hash TEXT NOT NULL REFERENCES blobs (hash),
+                    filename TEXT NOT NULL
+                )
+            """)
+
+            self._execute(
+                cursor,
+                "CREATE INDEX IF NOT EXISTS idx_post_attachments_post_id ON post_attachments (post_id)"
+            )
+
+            # Посты, созданные до появления журнала
+            self._execute(cursor, """
+                INSERT INTO post_changes (post_id, op)
+                SELECT id, 'upsert' FROM posts
+                WHERE id NOT IN (SELECT post_id FROM post_changes)
+                ORDER BY id
+            """)
+
             conn.commit()
 
-    def add_post(self, title: str, content: str) -> int:
+    def _record_change(self, cursor, post_id: int, op: str):
+        # Предыдущая запись о посте больше не нужна: клиент получит актуальное состояние
+        self._execute(cursor, "DELETE FROM post_changes WHERE post_id = ?", (post_id,))
+        self._execute(
+            cursor,
+            "INSERT INTO post_changes (post_id, op) VALUES (?, ?)",
+            (post_id, op)
+        )
+
+    def add_post(self, title: str, content: str, publish_at: Optional[str] = None) -> int:
         with self._lock:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute(
-                    "INSERT INTO posts (title, content) VALUES (?, ?)",
-                    (title, content)
+                self._execute(
+                    cursor,
+                    "INSERT INTO posts (title, content, publish_at, published) "
+                    "VALUES (?, ?, COALESCE(?, CURRENT_TIMESTAMP), COALESCE(?, CURRENT_TIMESTAMP) <= CURRENT_TIMESTAMP)",
+                    (title, content, publish_at, publish_at)
                 )
+                post_id = cursor.lastrowid
+                self._record_change(cursor, post_id, "upsert")
                 conn.commit()
-                return cursor.lastrowid
+                return post_id
 
-    def get_all_posts(self) -> List[Dict[str, Any]]:
+    def get_all_posts(self, include_unpublished: bool = False) -> List[Post]:
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM posts ORDER BY created_at DESC")
-            rows = cursor.fetchall()
+            cursor.row_factory = post_row
+            if include_unpublished:
+                return self._execute(
+                    cursor,
+                    f"SELECT {POST_COLUMNS} FROM posts ORDER BY created_at DESC, id DESC",
+                    fetch="all"
+                )
+            # Опубликованы почти все посты: "+" запрещает поиск по idx_posts_publish_at с последующей
+            # сортировкой, фильтр применяется при проходе по idx_posts_created_at
+            return self._execute(
+                cursor,
+                f"SELECT {POST_COLUMNS} FROM posts WHERE +publish_at <= CURRENT_TIMESTAMP "
+                "ORDER BY created_at DESC, id DESC",
+                fetch="all"
+            )
+
+    def get_post_by_id(self, post_id: int, include_unpublished: bool = False) -> Optional[Post]:
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = post_row
+            if include_unpublished:
+                return self._execute(
+                    cursor,
+                    f"SELECT {POST_COLUMNS} FROM posts WHERE id = ?",
+                    (post_id,),
+                    fetch="one"
+                )
+            return self._execute(
+                cursor,
+                f"SELECT {POST_COLUMNS} FROM posts WHERE id = ? AND publish_at <= CURRENT_TIMESTAMP",
+                (post_id,),
+                fetch="one"
+            )
+
+    def get_scheduled_posts(self) -> List[Post]:
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = post_row
+            return self._execute(
+                cursor,
+                f"SELECT {POST_COLUMNS} FROM posts WHERE publish_at > CURRENT_TIMESTAMP "
+                "ORDER BY publish_at, id",
+                fetch="all"
+            )
+
+    def get_due_publications(self) -> List[Post]:
+        # Время публикации наступило, но планировщик ее не обработал (например, API был остановлен)
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = post_row
+            return self._execute(
+                cursor,
+                f"SELECT {POST_COLUMNS} FROM posts WHERE published = 0 AND publish_at <= CURRENT_TIMESTAMP "
+                "ORDER BY publish_at, id",
+                fetch="all"
+            )
+
+    def update_post(self, post_id: int, title: str, content: str,
+                    publish_at: Optional[str] = None) -> bool:
+        with self._lock:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                self._execute(
+                    cursor,
+                    "UPDATE posts SET title = ?, content = ?, publish_at = COALESCE(?, publish_at), "
+                    "published = CASE WHEN ? IS NULL THEN published ELSE ? <= CURRENT_TIMESTAMP END "
+                    "WHERE id = ?",
+                    (title, content, publish_at, publish_at, publish_at, post_id)
+                )
+                updated = cursor.rowcount > 0
+                if updated:
+                    self._record_change(cursor, post_id, "upsert")
+                conn.commit()
+                return updated
+
+    def delete_post(self, post_id: int) -> bool:
+        with self._lock:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                self._execute(cursor, "DELETE FROM posts WHERE id = ?", (post_id,))
+                deleted = cursor.rowcount > 0
+                if deleted:
+                    self._execute(cursor, "DELETE FROM post_attachments WHERE post_id = ?", (post_id,))
+                    self._record_change(cursor, post_id, "delete")
+                    self._compact_changes(cursor)
+                conn.commit()
+                return deleted
+
+    def add_attachment(self, post_id: int, blob_hash: str, size: int, content_type: str,
+                       filename: str) -> int:
+        with self._lock:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                self._execute(
+                    cursor,
+                    "INSERT OR IGNORE INTO blobs (hash, size, content_type) VALUES (?, ?, ?)",
+                    (blob_hash, size, content_type)
+                )
+                self._execute(
+                    cursor,
+                    "INSERT INTO post_attachments (post_id, hash, filename) VALUES (?, ?, ?)",
+                    (post_id, blob_hash, filename)
+                )
+                attachment_id = cursor.lastrowid
+                self._record_change(cursor, post_id, "upsert")
+                conn.commit()
+                return attachment_id
+
+    def get_attachments(self, post_id: int) -> List[Dict[str, Any]]:
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            rows = self._execute(cursor, """
+                SELECT a.id, a.post_id, a.hash, a.filename, b.size, b.content_type, b.telegram_file_id
+                FROM post_attachments a
+                JOIN blobs b ON b.hash = a.hash
+                WHERE a.post_id = ?
+                ORDER BY a.id
+            """, (post_id,), fetch="all")
             return [dict(row) for row in rows]
 
-    def get_post_by_id(self, post_id: int) -> Optional[Dict[str, Any]]:
+    def get_blob(self, blob_hash: str) -> Optional[Dict[str, Any]]:
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM posts WHERE id = ?", (post_id,))
-            row = cursor.fetchone()
+            row = self._execute(cursor, "SELECT * FROM blobs WHERE hash = ?", (blob_hash,), fetch="one")
             return dict(row) if row else None
 
-    def update_post(self, post_id: int, title: str, content: str) -> bool:
+    def set_telegram_file_id(self, blob_hash: str, file_id: str):
         with self._lock:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute(
-                    "UPDATE posts SET title = ?, content = ? WHERE id = ?",
-                    (title, content, post_id)
+                self._execute(
+                    cursor,
+                    "UPDATE blobs SET telegram_file_id = ? WHERE hash = ?",
+                    (file_id, blob_hash)
                 )
                 conn.commit()
-                return cursor.rowcount > 0
 
-    def delete_post(self, post_id: int) -> bool:
+    def delete_attachment(self, post_id: int, attachment_id: int) -> bool:
         with self._lock:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute("DELETE FROM posts WHERE id = ?", (post_id,))
+                self._execute(
+                    cursor,
+                    "DELETE FROM post_attachments WHERE id = ? AND post_id = ?",
+                    (attachment_id, post_id)
+                )
+                deleted = cursor.rowcount > 0
+                if deleted:
+                    self._record_change(cursor, post_id, "upsert")
                 conn.commit()
-                return cursor.rowcount > 0
+                return deleted
+
+    def _compact_changes(self, cursor):
+        # Старые надгробия удаляются; клиентам с курсором ниже границы нужна полная синхронизация
+        row = self._execute(
+            cursor,
+            "SELECT MAX(version) FROM post_changes "
+            "WHERE op = 'delete' AND changed_at < datetime('now', ?)",
+            (f"-{self.changes_retention_days} days",),
+            fetch="one"
+        )
+        compacted_through = row[0]
+        if compacted_through is None:
+            return
+
+        self._execute(
+            cursor,
+            "DELETE FROM post_changes WHERE op = 'delete' AND version <= ?",
+            (compacted_through,)
+        )
+        self._execute(
+            cursor,
+            "INSERT INTO sync_state (key, value) VALUES ('compacted_through', ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = MAX(value, excluded.value)",
+            (compacted_through,)
+        )
+
+    def record_publication(self, post_id: int) -> Optional[Post]:
+        # Наступило время публикации: новая версия в журнале сообщает о посте клиентам ленты
+        with self._lock:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = post_row
+                post = self._execute(
+                    cursor,
+                    f"SELECT {POST_COLUMNS} FROM posts WHERE id = ?",
+                    (post_id,),
+                    fetch="one"
+                )
+                if post is not None:
+                    self._execute(cursor, "UPDATE posts SET published = 1 WHERE id = ?", (post_id,))
+                    self._record_change(cursor, post_id, "upsert")
+                    conn.commit()
+                return post
+
+    def get_changes(self, since: int, limit: int = 500,
+                    include_unpublished: bool = False) -> Dict[str, Any]:
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+
+            row = self._execute(
+                cursor,
+                "SELECT seq FROM sqlite_sequence WHERE name = 'post_changes'",
+                fetch="one"
+            )
+            current_version = row[0] if row else 0
+
+            row = self._execute(
+                cursor,
+                "SELECT value FROM sync_state WHERE key = 'compacted_through'",
+                fetch="one"
+            )
+            reset = bool(row) and since < row[0]
+            if reset:
+                since = 0
+
+            rows = self._execute(cursor, """
+                SELECT c.version, c.post_id, c.op, p.title, p.content, p.created_at, p.publish_at,
+                       p.publish_at <= CURRENT_TIMESTAMP AS published
+                FROM post_changes c
+                LEFT JOIN posts p ON p.id = c.post_id
+                WHERE c.version > ?
+                ORDER BY c.version
+                LIMIT ?
+            """, (since, limit + 1), fetch="all")
+
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+
+            changes = []
+            for row in rows:
+                op = row["op"]
+                post = None
+                if op == "upsert" and row["title"] is not None:
+                    if include_unpublished or row["published"]:
+                        post = Post(
+                            row["post_id"], row["title"], row["content"],
+                            row["created_at"], row["publish_at"]
+                        )
+                    else:
+                        # До публикации пост для клиентов ленты не существует
+                        op = "delete"
+                changes.append({
+                    "version": row["version"],
+                    "post_id": row["post_id"],
+                    "op": op,
+                    "post": post,
+                })
+
+            last_version = rows[-1]["version"] if rows else since
+            return {
+                "version": last_version if has_more else max(current_version, last_version),
+                "changes": changes,
+                "has_more": has_more,
+                "reset": reset,
+            }
 
     def check_connection(self) -> bool:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute("SELECT 1")
+                self._execute(cursor, "SELECT 1")
                 return True
         except Exception:
             return False
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional, Set, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateDispatcher:
+    # Обновления разных чатов обрабатываются параллельно пулом из workers задач,
+    # обновления одного чата - строго по очереди. В очереди ready каждый чат встречается
+    # не более одного раза, поэтому один активный чат не занимает несколько воркеров.
+    # submit() ждет, пока в обработке меньше max_pending обновлений (backpressure).
+    def __init__(self, workers: int = 8, max_pending: int = 1000, latency_window: int = 1000):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._chats: Dict[Hashable, Deque[Tuple[float, Callable[[], Awaitable[Any]]]]] = {}
+        self._scheduled: Set[Hashable] = set()
+        self._ready: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._tasks = []
+        self._pending = 0
+        self._latencies: Deque[float] = deque(maxlen=latency_window)
+        self.stats = {"processed": 0, "failed": 0, "max_depth": 0, "backpressure_waits": 0}
+
+    def start(self):
+        self._ready = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_pending)
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"update-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self, drain: bool = True, timeout: Optional[float] = None):
+        # main() останавливает диспетчер в finally, даже если до start() дело не дошло
+        if self._idle is None:
+            return
+
+        if drain:
+            # Зависший обработчик не должен блокировать остановку бесконечно
+            try:
+                await asyncio.wait_for(self.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Не дождались обработки {self._pending} обновлений за {timeout} с, они отменяются")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def join(self):
+        await self._idle.wait()
+
+    async def submit(self, chat_key: Hashable, job: Callable[[], Awaitable[Any]]):
+        if self._slots.locked():
+            self.stats["backpressure_waits"] += 1
+        await self._slots.acquire()
+
+        self._pending += 1
+        self._idle.clear()
+        self.stats["max_depth"] = max(self.stats["max_depth"], self._pending)
+
+        self._chats.setdefault(chat_key, deque()).append((time.perf_counter(), job))
+        if chat_key not in self._scheduled:
+            self._scheduled.add(chat_key)
+            self._ready.put_nowait(chat_key)
+
+    async def _worker(self):
+        while True:
+            chat_key = await self._ready.get()
+            chat_queue = self._chats[chat_key]
+            submitted_at, job = chat_queue.popleft()
+
+            try:
+                await job()
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.error(f"Ошибка обработки обновления чата {chat_key}: {e}")
+            finally:
+                self._latencies.append(time.perf_counter() - submitted_at)
+                self.stats["processed"] += 1
+                self._pending -= 1
+                self._slots.release()
+                if not self._pending:
+                    self._idle.set()
+
+                # Следующее обновление этого чата встает в конец общей очереди - чаты чередуются
+                if chat_queue:
+                    self._ready.put_nowait(chat_key)
+                else:
+                    del self._chats[chat_key]
+                    self._scheduled.discard(chat_key)
+
+    def metrics(self) -> Dict[str, Any]:
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+        return {
+            **self.stats,
+            "depth": self._pending,
+            "active_chats": len(self._chats),
+            "latency_ms": {"p50": percentile(0.5), "p95": percentile(0.95), "p99": percentile(0.99)},
+        }
@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseMaintenance:
+    # Обслуживание идет маленькими шагами и только когда в базу давно никто не писал:
+    # PRAGMA data_version меняется при каждом коммите из другого соединения (в том числе процесса)
+    def __init__(self, db_path: str, interval: float = 3600.0, idle_seconds: float = 30.0,
+                 vacuum_pages: int = 64, step_pause: float = 0.05, media_dir: Optional[str] = None):
+        self.db_path = db_path
+        self.media_dir = media_dir
+        self.interval = interval
+        self.idle_seconds = idle_seconds
+        self.vacuum_pages = vacuum_pages
+        self.step_pause = step_pause
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._data_version = None
+        self._last_write = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+        self.stats: Dict[str, Any] = {
+            "runs": 0,
+            "skipped_busy": 0,
+            "pages_reclaimed": 0,
+            "blobs_removed": 0,
+            "media_bytes_freed": 0,
+            "time_ms": {"media": 0.0, "optimize": 0.0, "analyze": 0.0, "checkpoint": 0.0, "vacuum": 0.0},
+            "last_run": None,
+        }
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        return self._conn
+
+    def _pragma(self, sql: str):
+        return self._connection().execute(sql).fetchone()
+
+    def is_idle(self) -> bool:
+        data_version = self._pragma("PRAGMA data_version")[0]
+        if data_version != self._data_version:
+            self._data_version = data_version
+            self._last_write = time.monotonic()
+        return time.monotonic() - self._last_write >= self.idle_seconds
+
+    def _timed(self, step: str, sql: str):
+        started = time.perf_counter()
+        result = self._connection().execute(sql).fetchall()
+        self.stats["time_ms"][step] += (time.perf_counter() - started) * 1000
+        return result
+
+    def run_once(self, force: bool = False) -> Dict[str, Any]:
+        with self._lock:
+            if not force and not self.is_idle():
+                self.stats["skipped_busy"] += 1
+                return {"skipped": True}
+
+            started = time.perf_counter()
+            report: Dict[str, Any] = {"skipped": False}
+
+            # Строки удаляются до vacuum, чтобы освобожденные страницы вернулись в этом же проходе
+            report["blobs_removed"], report["media_bytes_freed"] = self._sweep_media()
+
+            self._timed("optimize", "PRAGMA optimize")
+
+            # analysis_limit ограничивает ANALYZE выборкой строк из каждого индекса
+            self._pragma("PRAGMA analysis_limit = 1000")
+            self._timed("analyze", "ANALYZE")
+
+            if self._pragma("PRAGMA journal_mode")[0] == "wal":
+                busy, log_pages, checkpointed = self._timed("checkpoint", "PRAGMA wal_checkpoint(PASSIVE)")[0]
+                report["checkpoint"] = {"busy": busy, "log_pages": log_pages, "checkpointed": checkpointed}
+
+            report["pages_reclaimed"] = self._incremental_vacuum(force)
+            report["duration_ms"] = (time.perf_counter() - started) * 1000
+
+            self.stats["runs"] += 1
+            self.stats["pages_reclaimed"] += report["pages_reclaimed"]
+            self.stats["blobs_removed"] += report["blobs_removed"]
+            self.stats["media_bytes_freed"] += report["media_bytes_freed"]
+            self.stats["last_run"] = {**report, "finished_at": time.time()}
+            return report
+
+    def _sweep_media(self) -> Tuple[int, int]:
+        # Файлы, на которые больше не ссылается ни одно вложение (после удаления постов и вложений)
+        conn = self._connection()
+        started = time.perf_counter()
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'blobs'").fetchone() is None:
+            return 0, 0
+
+        # Выборка и удаление в одной транзакции: файл, к которому успели прикрепить вложение, не попадет в список
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            orphans = [
+                row[0] for row in conn.execute(
+                    "SELECT hash FROM blobs WHERE hash NOT IN (SELECT hash FROM post_attachments)"
+                ).fetchall()
+            ]
+            if orphans:
+                conn.execute("DELETE FROM blobs WHERE hash NOT IN (SELECT hash FROM post_attachments)")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        freed = 0
+        if self.media_dir is not None:
+            from media import MediaStore
+            store = MediaStore(self.media_dir)
+            for blob_hash in orphans:
+                # Тот же файл могли загрузить заново, пока шла очистка. Проверка и удаление идут под
+                # блокировкой записи: add_attachment либо успеет раньше, и файл останется, либо
+                # выполнится после удаления, и загрузка восстановит файл (см. upload_attachment)
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    if conn.execute("SELECT 1 FROM blobs WHERE hash = ?", (blob_hash,)).fetchone() is None:
+                        freed += store.remove(blob_hash)
+                finally:
+                    conn.execute("COMMIT")
+
+        self.stats["time_ms"]["media"] += (time.perf_counter() - started) * 1000
+        return len(orphans), freed
+
+    def _incremental_vacuum(self, force: bool) -> int:
+        # Без auto_vacuum=INCREMENTAL команда ничего не делает (см. enable_incremental_vacuum)
+        if self._pragma("PRAGMA auto_vacuum")[0] != 2:
+            return 0
+
+        reclaimed = 0
+        while True:
+            free_before = self._pragma("PRAGMA freelist_count")[0]
+            if free_before == 0:
+                break
+
+            self._timed("vacuum", f"PRAGMA incremental_vacuum({self.vacuum_pages})")
+            freed = free_before - self._pragma("PRAGMA freelist_count")[0]
+            reclaimed += freed
+            if freed <= 0:
+                break
+
+            # Между шагами даем дорогу писателям и прекращаем работу, если база снова занята
+            time.sleep(self.step_pause)
+            if not force and not self.is_idle():
+                break
+        return reclaimed
+
+    def enable_incremental_vacuum(self):
+        # Переключение режима требует полного VACUUM: выполняется один раз, вручную
+        with self._lock:
+            self._pragma("PRAGMA auto_vacuum = INCREMENTAL")
+            self._connection().execute("VACUUM")
+
+    async def _run(self):
+        delay = self.interval
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                report = await asyncio.to_thread(self.run_once)
+            except sqlite3.Error as e:
+                logger.error(f"Ошибка обслуживания базы: {e}")
+                delay = self.interval
+                continue
+
+            if report["skipped"]:
+                # База занята - пробуем снова после ожидаемого периода простоя
+                delay = self.idle_seconds
+                continue
+
+            delay = self.interval
+            logger.info(
+                f"Обслуживание базы: освобождено страниц {report['pages_reclaimed']}, "
+                f"удалено файлов {report['blobs_removed']}, "
+                f"{report['duration_ms']:.1f} мс"
+            )
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,73 @@
+import hashlib
+import os
+import tempfile
+from typing import Awaitable, Callable, Optional, Tuple
+
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class MediaTooLarge(Exception):
+    pass
+
+
+class MediaStore:
+    # Файл лежит по пути root/ab/cd/<sha256>: одинаковое содержимое хранится один раз
+    def __init__(self, root: str, max_bytes: int = 0):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def path(self, blob_hash: str) -> str:
+        return os.path.join(self.root, blob_hash[:2], blob_hash[2:4], blob_hash)
+
+    def exists(self, blob_hash: str) -> bool:
+        return os.path.exists(self.path(blob_hash))
+
+    async def save(self, read: Callable[[int], Awaitable[bytes]]) -> Tuple[str, int]:
+        # Содержимое читается и хешируется по частям, целиком в памяти не держится
+        tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    chunk = await read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if self.max_bytes and size > self.max_bytes:
+                        raise MediaTooLarge(f"Файл больше {self.max_bytes} байт")
+                    digest.update(chunk)
+                    f.write(chunk)
+
+            blob_hash = digest.hexdigest()
+            path = self.path(blob_hash)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+            return blob_hash, size
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def remove(self, blob_hash: str) -> int:
+        path = self.path(blob_hash)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return 0
+        return size
+
+    def open_path(self, blob_hash: str) -> Optional[str]:
+        # Хеш приходит из URL: принимаем только 64 шестнадцатеричных символа
+        if len(blob_hash) != 64 or any(c not in "0123456789abcdef" for c in blob_hash):
+            return None
+        path = self.path(blob_hash)
+        return path if os.path.exists(path) else None
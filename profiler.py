@@ -0,0 +1,173 @@
+import asyncio
+import io
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+
+class _StackSampler(threading.Thread):
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class Profiler:
+    MODES = ("cprofile", "sample")
+
+    # start/stop вызываются из потока event loop: cProfile профилирует только поток,
+    # в котором его включили, а сэмплер снимает стеки именно с этого потока
+    def __init__(self):
+        self.active = False
+        self.mode = None
+        self.max_requests = 0
+        self.completed = 0
+        self.started_at = None
+        self.finished_at = None
+        self._deadline = None
+        self._timer = None
+        self._profile = None
+        self._sampler = None
+        self._stats = None
+        self._stacks = None
+
+    def start(self, mode: str = "cprofile", requests: int = 0, seconds: float = 0.0,
+              interval: float = 0.005):
+        if self.active:
+            raise RuntimeError("Профилирование уже запущено")
+        if mode not in self.MODES:
+            raise ValueError(f"Неизвестный режим профилирования: {mode}")
+        if requests <= 0 and seconds <= 0:
+            raise ValueError("Нужно указать число запросов или длительность")
+
+        self.mode = mode
+        self.max_requests = requests
+        self.completed = 0
+        self.started_at = time.time()
+        self.finished_at = None
+        self._deadline = time.monotonic() + seconds if seconds > 0 else None
+        self._stats = None
+        self._stacks = None
+
+        if mode == "cprofile":
+            import cProfile
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = _StackSampler(threading.get_ident(), interval)
+            self._sampler.start()
+
+        self.active = True
+
+        # Сессия по времени завершается сама, даже если запросов больше не будет
+        if seconds > 0:
+            try:
+                self._timer = asyncio.get_running_loop().call_later(seconds, self.stop)
+            except RuntimeError:
+                self._timer = None
+
+    def request_finished(self):
+        if not self.active:
+            return
+
+        self.completed += 1
+        if self.max_requests and self.completed >= self.max_requests:
+            self.stop()
+        else:
+            self.check_deadline()
+
+    def check_deadline(self):
+        if self.active and self._deadline is not None and time.monotonic() >= self._deadline:
+            self.stop()
+
+    def stop(self):
+        if not self.active:
+            return
+
+        self.active = False
+        self.finished_at = time.time()
+
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if self._profile is not None:
+            import pstats
+            self._profile.disable()
+            self._stats = pstats.Stats(self._profile)
+            self._profile = None
+
+        if self._sampler is not None:
+            self._sampler.stop()
+            self._stacks = self._sampler.stacks
+            self._sampler = None
+
+    def status(self) -> Dict[str, Any]:
+        self.check_deadline()
+        return {
+            "active": self.active,
+            "mode": self.mode,
+            "requests": self.completed,
+            "max_requests": self.max_requests,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "has_report": self._stats is not None or self._stacks is not None,
+        }
+
+    def pstats_text(self, sort: str = "cumulative", limit: int = 50) -> Optional[str]:
+        if self._stats is None:
+            return None
+
+        stream = io.StringIO()
+        self._stats.stream = stream
+        self._stats.sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+    def collapsed_text(self) -> Optional[str]:
+        if self._stacks is None:
+            return None
+
+        # Формат flamegraph.pl / speedscope: "frame;frame;frame count"
+        return "\n".join(
+            f"{stack} {count}" for stack, count in self._stacks.most_common()
+        )
+
+    def report(self, output_format: str = "pstats") -> Optional[str]:
+        if output_format == "collapsed":
+            return self.collapsed_text()
+        return self.pstats_text()
+
+    def dump(self, directory: str, prefix: str) -> Optional[str]:
+        output_format = "pstats" if self._stats is not None else "collapsed"
+        text = self.report(output_format)
+        if text is None:
+            return None
+
+        os.makedirs(directory, exist_ok=True)
+        extension = "txt" if output_format == "pstats" else "folded"
+        path = os.path.join(directory, f"{prefix}_{int(self.finished_at)}.{extension}")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
@@ -1,10 +1,17 @@
+import argparse
 import asyncio
+import json
 import multiprocessing
 import signal
 import sys
 import time
 import os
-from config import BOT_TOKEN
+import urllib.request
+from config import (
+    BOT_TOKEN, API_HOST, API_PORT, DATABASE_PATH,
+    MAINTENANCE_INTERVAL, MAINTENANCE_IDLE_SECONDS, MAINTENANCE_VACUUM_PAGES,
+    SNAPSHOT_DIR, SNAPSHOT_KEEP, SNAPSHOT_COMPRESS, SNAPSHOT_STEP_PAGES, MEDIA_DIR
+)
 
 def run_bot():
     print("Запуск Telegram бота...")
@@ -24,6 +31,74 @@ def run_api():
         print(f"Ошибка запуска API: {e}")
         sys.exit(1)
 
+def wait_for_api(timeout: float = 10.0) -> bool:
+    # Вместо фиксированной паузы опрашиваем /health, пока API не начнет отвечать
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://{API_HOST}:{API_PORT}/health", timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+def run_maintenance(argv):
+    parser = argparse.ArgumentParser(prog="run.py maintenance", description="Обслуживание базы данных")
+    parser.add_argument("--once", action="store_true", help="выполнить один проход и выйти")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="перевести базу в auto_vacuum=INCREMENTAL (полный VACUUM)")
+    args = parser.parse_args(argv)
+
+    from maintenance import DatabaseMaintenance
+    maintenance = DatabaseMaintenance(
+        DATABASE_PATH, MAINTENANCE_INTERVAL, MAINTENANCE_IDLE_SECONDS, MAINTENANCE_VACUUM_PAGES,
+        media_dir=MEDIA_DIR
+    )
+
+    if args.enable_incremental_vacuum:
+        maintenance.enable_incremental_vacuum()
+        print("Включен режим auto_vacuum=INCREMENTAL")
+
+    if args.once:
+        print(json.dumps(maintenance.run_once(force=True), ensure_ascii=False, indent=2))
+        return
+
+    async def serve():
+        maintenance.start()
+        await asyncio.Event().wait()
+
+    print("Обслуживание базы запущено. Для остановки нажмите Ctrl+C")
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+def run_snapshot(argv):
+    parser = argparse.ArgumentParser(prog="run.py snapshot", description="Снимки базы данных")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    create = commands.add_parser("create", help="сделать снимок, не останавливая API и бота")
+    create.add_argument("--compress", action=argparse.BooleanOptionalAction, default=SNAPSHOT_COMPRESS)
+    create.add_argument("--keep", type=int, default=SNAPSHOT_KEEP, help="сколько последних снимков хранить")
+
+    commands.add_parser("list", help="список снимков")
+
+    restore = commands.add_parser("restore", help="восстановить базу из снимка")
+    restore.add_argument("name")
+
+    args = parser.parse_args(argv)
+
+    from snapshots import create_snapshot, list_snapshots, restore_snapshot
+    if args.command == "create":
+        result = create_snapshot(DATABASE_PATH, SNAPSHOT_DIR, args.compress, args.keep, SNAPSHOT_STEP_PAGES)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    elif args.command == "list":
+        for snapshot in list_snapshots(DATABASE_PATH, SNAPSHOT_DIR):
+            print(f"{snapshot['name']}  {snapshot['size']} байт  {snapshot['created_at']}")
+    else:
+        restore_snapshot(DATABASE_PATH, SNAPSHOT_DIR, args.name)
+        print(f"База восстановлена из снимка {args.name}")
+
 def signal_handler(sig, frame):
     print("\nПолучен сигнал завершения. Останавливаем процессы...")
     sys.exit(0)
@@ -46,14 +121,17 @@ def main():
         api_process = multiprocessing.Process(target=run_api, name="API-Server")
         api_process.start()
         processes.append(api_process)
-        print("API сервер запущен")
-
-        time.sleep(2)
 
+        # Бот не зависит от API, поэтому оба процесса стартуют параллельно
         bot_process = multiprocessing.Process(target=run_bot, name="Telegram-Bot")
         bot_process.start()
         processes.append(bot_process)
 
+        if wait_for_api():
+            print("API сервер запущен")
+        else:
+            print("API сервер не ответил на /health, проверьте логи")
+
         print("Система успешно запущена!")
         print("Документация API: http://127.0.0.1:8000/docs")
         print("Админ-панель: http://127.0.0.1:8000/admin")
@@ -82,4 +160,9 @@ def main():
 
 if __name__ == "__main__":
     multiprocessing.freeze_support()
-    main()
+    if sys.argv[1:2] == ["maintenance"]:
+        run_maintenance(sys.argv[2:])
+    elif sys.argv[1:2] == ["snapshot"]:
+        run_snapshot(sys.argv[2:])
+    else:
+        main()
@@ -0,0 +1,117 @@
+import asyncio
+import heapq
+import inspect
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class PublicationScheduler:
+    # Ближайшие публикации лежат в min-heap; задача спит до первой из них, а не опрашивает базу.
+    # Перенесенные и отмененные публикации не удаляются из кучи, а пропускаются при извлечении.
+    def __init__(self, storage):
+        self.storage = storage
+        self._heap: List[Tuple[str, int]] = []
+        self._pending: Dict[int, str] = {}
+        self._hooks: List[Callable[[Any], Any]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def add_hook(self, hook: Callable[[Any], Any]):
+        self._hooks.append(hook)
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+
+        # После перезапуска восстанавливаем очередь из базы
+        self.reload()
+
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Планировщик публикаций запущен, в очереди: {len(self._pending)}")
+
+    async def stop(self):
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def schedule(self, post_id: int, publish_at: str):
+        if publish_at <= datetime.utcnow().strftime(TIMESTAMP_FORMAT):
+            self.cancel(post_id)
+            return
+
+        self._push(post_id, publish_at)
+
+    def _push(self, post_id: int, publish_at: str):
+        self._pending[post_id] = publish_at
+        heapq.heappush(self._heap, (publish_at, post_id))
+        if self._heap[0] == (publish_at, post_id) and self._wakeup is not None:
+            self._wakeup.set()
+
+    def reload(self):
+        self._heap.clear()
+        self._pending.clear()
+        # Публикации, время которых наступило, пока планировщик не работал: в куче они
+        # оказываются первыми и выполняются сразу после запуска
+        for post in self.storage.get_due_publications():
+            self._push(post.id, post.publish_at)
+        for post in self.storage.get_scheduled_posts():
+            self.schedule(post.id, post.publish_at)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def cancel(self, post_id: int):
+        self._pending.pop(post_id, None)
+
+    def pending(self) -> List[Dict[str, Any]]:
+        return [
+            {"post_id": post_id, "publish_at": publish_at}
+            for post_id, publish_at in sorted(self._pending.items(), key=lambda item: item[1])
+        ]
+
+    async def _run(self):
+        while True:
+            while self._heap and self._pending.get(self._heap[0][1]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+
+            if not self._heap:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            publish_at, post_id = self._heap[0]
+            delay = (datetime.strptime(publish_at, TIMESTAMP_FORMAT) - datetime.utcnow()).total_seconds()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            heapq.heappop(self._heap)
+            del self._pending[post_id]
+            await self._publish(post_id)
+
+    async def _publish(self, post_id: int):
+        post = self.storage.record_publication(post_id)
+        if post is None:
+            return
+
+        for hook in self._hooks:
+            try:
+                result = hook(post)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Ошибка в обработчике публикации поста {post_id}: {e}")
@@ -0,0 +1,157 @@
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, List
+
+
+SNAPSHOT_SUFFIXES = (".db", ".db.gz")
+
+
+def _snapshot_prefix(db_path: str) -> str:
+    return os.path.splitext(os.path.basename(db_path))[0] + "-"
+
+
+def list_snapshots(db_path: str, directory: str) -> List[Dict[str, Any]]:
+    if not os.path.isdir(directory):
+        return []
+
+    prefix = _snapshot_prefix(db_path)
+    snapshots = []
+    for name in os.listdir(directory):
+        if not name.startswith(prefix) or not name.endswith(SNAPSHOT_SUFFIXES):
+            continue
+        stat = os.stat(os.path.join(directory, name))
+        snapshots.append({
+            "name": name,
+            "size": stat.st_size,
+            "created_at": datetime.fromtimestamp(stat.st_mtime).isoformat(timespec="seconds"),
+            "compressed": name.endswith(".gz"),
+        })
+
+    # Имя содержит время создания, поэтому сортировка по имени - хронологическая
+    snapshots.sort(key=lambda snapshot: snapshot["name"], reverse=True)
+    return snapshots
+
+
+def create_snapshot(db_path: str, directory: str, compress: bool = False, keep: int = 0,
+                    step_pages: int = 64, step_pause: float = 0.01) -> Dict[str, Any]:
+    os.makedirs(directory, exist_ok=True)
+    name = f"{_snapshot_prefix(db_path)}{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.db"
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=directory)
+    os.close(fd)
+
+    try:
+        # Онлайн-бэкап копирует по step_pages страниц и отпускает блокировку между шагами,
+        # так что API и бот продолжают читать и писать
+        source = sqlite3.connect(db_path, timeout=30)
+        target = sqlite3.connect(tmp_path)
+        try:
+            source.backup(target, pages=step_pages, sleep=step_pause)
+            # Снимок должен быть одним файлом, без -wal рядом
+            target.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            target.close()
+            source.close()
+
+        if compress:
+            name += ".gz"
+            compressed_path = tmp_path + ".gz"
+            with open(tmp_path, "rb") as src, gzip.open(compressed_path, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(tmp_path)
+            tmp_path = compressed_path
+
+        path = os.path.join(directory, name)
+        os.replace(tmp_path, path)
+    except BaseException:
+        for leftover in (tmp_path, tmp_path + ".gz"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        raise
+
+    removed = rotate_snapshots(db_path, directory, keep) if keep > 0 else []
+    return {"name": name, "size": os.path.getsize(path), "compressed": compress, "removed": removed}
+
+
+def rotate_snapshots(db_path: str, directory: str, keep: int) -> List[str]:
+    removed = []
+    for snapshot in list_snapshots(db_path, directory)[keep:]:
+        os.remove(os.path.join(directory, snapshot["name"]))
+        removed.append(snapshot["name"])
+    return removed
+
+
+def restore_snapshot(db_path: str, directory: str, name: str):
+    if os.path.basename(name) != name or not name.endswith(SNAPSHOT_SUFFIXES):
+        raise ValueError(f"Некорректное имя снимка: {name}")
+
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Снимок не найден: {name}")
+
+    tmp_path = None
+    try:
+        if name.endswith(".gz"):
+            fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=directory)
+            with os.fdopen(fd, "wb") as dst, gzip.open(path, "rb") as src:
+                shutil.copyfileobj(src, dst)
+            path = tmp_path
+
+        source = sqlite3.connect(path)
+        target = sqlite3.connect(db_path, timeout=30)
+        try:
+            integrity = source.execute("PRAGMA quick_check").fetchone()[0]
+            if integrity != "ok":
+                raise ValueError(f"Снимок поврежден: {integrity}")
+
+            version = _changes_version(target)
+
+            # Копирование за один шаг - одна транзакция: другие соединения видят
+            # либо старую базу целиком, либо восстановленную, и файл не подменяется под ними
+            source.backup(target, pages=-1)
+
+            _force_resync(target, version)
+        finally:
+            target.close()
+            source.close()
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _changes_version(conn: sqlite3.Connection) -> int:
+    try:
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'post_changes'").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] if row else 0
+
+
+def _force_resync(conn: sqlite3.Connection, version: int):
+    # Клиенты ленты изменений могли уйти дальше восстановленной версии: сдвигаем счетчик
+    # за старую версию и помечаем все до нее как сжатое, чтобы они запросили полную синхронизацию
+    if version == 0:
+        return
+
+    border = version + 1
+    try:
+        updated = conn.execute(
+            "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'post_changes'",
+            (border,)
+        ).rowcount
+        if not updated:
+            conn.execute(
+                "INSERT INTO sqlite_sequence (name, seq) VALUES ('post_changes', ?)",
+                (border,)
+            )
+        conn.execute(
+            "INSERT INTO sync_state (key, value) VALUES ('compacted_through', ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = MAX(value, excluded.value)",
+            (border,)
+        )
+        conn.commit()
+    except sqlite3.OperationalError:
+        conn.rollback()
@@ -0,0 +1,393 @@
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+from typing import Protocol, List, Dict, Any, Optional, Set, Tuple
+
+from database import DatabaseManager, Post
+
+
+class StorageBackend(Protocol):
+    def create_tables(self): ...
+
+    def add_post(self, title: str, content: str, publish_at: Optional[str] = None) -> int: ...
+
+    def get_all_posts(self, include_unpublished: bool = False) -> List[Post]: ...
+
+    def get_post_by_id(self, post_id: int, include_unpublished: bool = False) -> Optional[Post]: ...
+
+    def get_scheduled_posts(self) -> List[Post]: ...
+
+    def get_due_publications(self) -> List[Post]: ...
+
+    def update_post(self, post_id: int, title: str, content: str,
+                    publish_at: Optional[str] = None) -> bool: ...
+
+    def delete_post(self, post_id: int) -> bool: ...
+
+    def add_attachment(self, post_id: int, blob_hash: str, size: int, content_type: str,
+                       filename: str) -> int: ...
+
+    def get_attachments(self, post_id: int) -> List[Dict[str, Any]]: ...
+
+    def get_blob(self, blob_hash: str) -> Optional[Dict[str, Any]]: ...
+
+    def set_telegram_file_id(self, blob_hash: str, file_id: str): ...
+
+    def delete_attachment(self, post_id: int, attachment_id: int) -> bool: ...
+
+    def record_publication(self, post_id: int) -> Optional[Post]: ...
+
+    def get_changes(self, since: int, limit: int = 500,
+                    include_unpublished: bool = False) -> Dict[str, Any]: ...
+
+    def get_query_stats(self) -> List[Dict[str, Any]]: ...
+
+    def reset_query_stats(self): ...
+
+    def check_connection(self) -> bool: ...
+
+
+def _utcnow() -> str:
+    # Тот же формат, что у CURRENT_TIMESTAMP в SQLite: строки сравниваются как даты
+    return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class InMemoryStorage:
+    # Посты хранятся в словаре по id и в списке ключей (created_at, id), отсортированном по возрастанию.
+    # С persistent=DatabaseManager запись идет сначала в SQLite, а изменения других процессов
+    # подтягиваются из журнала post_changes не чаще раза в sync_interval секунд.
+    def __init__(self, persistent: Optional[DatabaseManager] = None, sync_interval: float = 1.0,
+                 changes_retention_days: int = 30):
+        self.persistent = persistent
+        self.sync_interval = sync_interval
+        self.changes_retention_days = changes_retention_days
+        self._lock = threading.RLock()
+        self._posts: Dict[int, Post] = {}
+        self._order: List[Tuple[str, int]] = []
+        self._next_id = 1
+        self._unpublished: Set[int] = set()
+        self._synced_version = 0
+        self._synced_at = 0.0
+
+        # Вложения и журнал изменений без персистентности
+        self._blobs: Dict[str, Dict[str, Any]] = {}
+        self._attachments: Dict[int, List[Dict[str, Any]]] = {}
+        self._next_attachment_id = 1
+
+        self._version = 0
+        self._compacted_through = 0
+        self._change_versions: List[int] = []
+        self._changes: Dict[int, Tuple[int, str, datetime]] = {}
+        self._change_by_post: Dict[int, int] = {}
+
+    def create_tables(self):
+        if self.persistent is None:
+            return
+
+        self.persistent.create_tables()
+        with self._lock:
+            self._posts.clear()
+            self._order.clear()
+            self._synced_version = 0
+            self._sync(force=True)
+
+    def _put(self, post: Post):
+        if post.id in self._posts:
+            self._remove(post.id)
+        self._posts[post.id] = post
+        insort(self._order, (post.created_at, post.id))
+        self._next_id = max(self._next_id, post.id + 1)
+
+    def _remove(self, post_id: int) -> bool:
+        post = self._posts.pop(post_id, None)
+        if post is None:
+            return False
+        key = (post.created_at, post_id)
+        del self._order[bisect_left(self._order, key)]
+        return True
+
+    def _sync(self, force: bool = False):
+        if self.persistent is None:
+            return
+        if not force and time.monotonic() - self._synced_at < self.sync_interval:
+            return
+
+        while True:
+            result = self.persistent.get_changes(self._synced_version, include_unpublished=True)
+            if result["reset"]:
+                self._posts.clear()
+                self._order.clear()
+
+            for change in result["changes"]:
+                if change["op"] == "delete" or change["post"] is None:
+                    self._remove(change["post_id"])
+                else:
+                    self._put(change["post"])
+
+            self._synced_version = result["version"]
+            if not result["has_more"]:
+                break
+
+        self._synced_at = time.monotonic()
+
+    def _record_change(self, post_id: int, op: str):
+        if self.persistent is not None:
+            return
+
+        old_version = self._change_by_post.pop(post_id, None)
+        if old_version is not None:
+            del self._changes[old_version]
+            del self._change_versions[bisect_left(self._change_versions, old_version)]
+
+        self._version += 1
+        self._changes[self._version] = (post_id, op, datetime.utcnow())
+        self._change_versions.append(self._version)
+        self._change_by_post[post_id] = self._version
+
+        if op == "delete":
+            self._compact_changes()
+
+    def _compact_changes(self):
+        border = datetime.utcnow() - timedelta(days=self.changes_retention_days)
+        expired = [
+            version for version, (_, op, changed_at) in self._changes.items()
+            if op == "delete" and changed_at < border
+        ]
+        for version in expired:
+            post_id, _, _ = self._changes.pop(version)
+            del self._change_by_post[post_id]
+            del self._change_versions[bisect_left(self._change_versions, version)]
+            self._compacted_through = max(self._compacted_through, version)
+
+    def add_post(self, title: str, content: str, publish_at: Optional[str] = None) -> int:
+        with self._lock:
+            if self.persistent is not None:
+                post_id = self.persistent.add_post(title, content, publish_at)
+                post = self.persistent.get_post_by_id(post_id, include_unpublished=True)
+            else:
+                post_id = self._next_id
+                created_at = _utcnow()
+                post = Post(post_id, title, content, created_at, publish_at or created_at)
+                if post.publish_at > created_at:
+                    self._unpublished.add(post_id)
+
+            self._put(post)
+            self._record_change(post_id, "upsert")
+            return post_id
+
+    # Записи неизменяемы, поэтому наружу отдаются без копирования
+    def get_all_posts(self, include_unpublished: bool = False) -> List[Post]:
+        with self._lock:
+            self._sync()
+            now = _utcnow()
+            posts = (self._posts[post_id] for _, post_id in reversed(self._order))
+            return [post for post in posts if include_unpublished or post.publish_at <= now]
+
+    def get_post_by_id(self, post_id: int, include_unpublished: bool = False) -> Optional[Post]:
+        with self._lock:
+            self._sync()
+            post = self._posts.get(post_id)
+            if post is None or (not include_unpublished and post.publish_at > _utcnow()):
+                return None
+            return post
+
+    def get_scheduled_posts(self) -> List[Post]:
+        with self._lock:
+            self._sync()
+            now = _utcnow()
+            posts = [post for post in self._posts.values() if post.publish_at > now]
+            posts.sort(key=lambda post: (post.publish_at, post.id))
+            return posts
+
+    def get_due_publications(self) -> List[Post]:
+        if self.persistent is not None:
+            return self.persistent.get_due_publications()
+
+        with self._lock:
+            now = _utcnow()
+            posts = [
+                self._posts[post_id] for post_id in self._unpublished
+                if post_id in self._posts and self._posts[post_id].publish_at <= now
+            ]
+            posts.sort(key=lambda post: (post.publish_at, post.id))
+            return posts
+
+    def update_post(self, post_id: int, title: str, content: str,
+                    publish_at: Optional[str] = None) -> bool:
+        with self._lock:
+            if self.persistent is not None:
+                if not self.persistent.update_post(post_id, title, content, publish_at):
+                    return False
+                post = self.persistent.get_post_by_id(post_id, include_unpublished=True)
+            else:
+                if post_id not in self._posts:
+                    return False
+                old = self._posts[post_id]
+                post = old._replace(title=title, content=content, publish_at=publish_at or old.publish_at)
+                if publish_at is not None:
+                    if publish_at > _utcnow():
+                        self._unpublished.add(post_id)
+                    else:
+                        self._unpublished.discard(post_id)
+
+            self._put(post)
+            self._record_change(post_id, "upsert")
+            return True
+
+    def delete_post(self, post_id: int) -> bool:
+        with self._lock:
+            if self.persistent is not None:
+                deleted = self.persistent.delete_post(post_id)
+                self._remove(post_id)
+            else:
+                deleted = self._remove(post_id)
+
+            if deleted:
+                self._attachments.pop(post_id, None)
+                self._record_change(post_id, "delete")
+            return deleted
+
+    def add_attachment(self, post_id: int, blob_hash: str, size: int, content_type: str,
+                       filename: str) -> int:
+        if self.persistent is not None:
+            return self.persistent.add_attachment(post_id, blob_hash, size, content_type, filename)
+
+        with self._lock:
+            self._blobs.setdefault(blob_hash, {
+                "hash": blob_hash,
+                "size": size,
+                "content_type": content_type,
+                "telegram_file_id": None,
+                "created_at": _utcnow(),
+            })
+            attachment_id = self._next_attachment_id
+            self._next_attachment_id += 1
+            self._attachments.setdefault(post_id, []).append(
+                {"id": attachment_id, "post_id": post_id, "hash": blob_hash, "filename": filename}
+            )
+            self._record_change(post_id, "upsert")
+            return attachment_id
+
+    def get_attachments(self, post_id: int) -> List[Dict[str, Any]]:
+        if self.persistent is not None:
+            return self.persistent.get_attachments(post_id)
+
+        with self._lock:
+            return [
+                {
+                    **attachment,
+                    "size": self._blobs[attachment["hash"]]["size"],
+                    "content_type": self._blobs[attachment["hash"]]["content_type"],
+                    "telegram_file_id": self._blobs[attachment["hash"]]["telegram_file_id"],
+                }
+                for attachment in self._attachments.get(post_id, [])
+            ]
+
+    def get_blob(self, blob_hash: str) -> Optional[Dict[str, Any]]:
+        if self.persistent is not None:
+            return self.persistent.get_blob(blob_hash)
+
+        with self._lock:
+            blob = self._blobs.get(blob_hash)
+            return dict(blob) if blob else None
+
+    def set_telegram_file_id(self, blob_hash: str, file_id: str):
+        if self.persistent is not None:
+            self.persistent.set_telegram_file_id(blob_hash, file_id)
+            return
+
+        with self._lock:
+            if blob_hash in self._blobs:
+                self._blobs[blob_hash]["telegram_file_id"] = file_id
+
+    def delete_attachment(self, post_id: int, attachment_id: int) -> bool:
+        if self.persistent is not None:
+            return self.persistent.delete_attachment(post_id, attachment_id)
+
+        with self._lock:
+            attachments = self._attachments.get(post_id, [])
+            for index, attachment in enumerate(attachments):
+                if attachment["id"] == attachment_id:
+                    del attachments[index]
+                    self._record_change(post_id, "upsert")
+                    return True
+            return False
+
+    def record_publication(self, post_id: int) -> Optional[Post]:
+        with self._lock:
+            if self.persistent is not None:
+                post = self.persistent.record_publication(post_id)
+            else:
+                post = self._posts.get(post_id)
+                self._unpublished.discard(post_id)
+
+            if post is not None:
+                self._put(post)
+                self._record_change(post_id, "upsert")
+            return post
+
+    def get_changes(self, since: int, limit: int = 500,
+                    include_unpublished: bool = False) -> Dict[str, Any]:
+        if self.persistent is not None:
+            return self.persistent.get_changes(since, limit, include_unpublished)
+
+        with self._lock:
+            reset = since < self._compacted_through
+            if reset:
+                since = 0
+
+            start = bisect_right(self._change_versions, since)
+            versions = self._change_versions[start:start + limit + 1]
+            has_more = len(versions) > limit
+            versions = versions[:limit]
+
+            now = _utcnow()
+            changes = []
+            for version in versions:
+                post_id, op, _ = self._changes[version]
+                post = self._posts.get(post_id) if op == "upsert" else None
+                if post is not None and not include_unpublished and post.publish_at > now:
+                    op, post = "delete", None
+                changes.append({
+                    "version": version,
+                    "post_id": post_id,
+                    "op": op,
+                    "post": post,
+                })
+
+            return {
+                "version": versions[-1] if has_more else max(self._version, since),
+                "changes": changes,
+                "has_more": has_more,
+                "reset": reset,
+            }
+
+    def get_query_stats(self) -> List[Dict[str, Any]]:
+        if self.persistent is not None:
+            return self.persistent.get_query_stats()
+        return []
+
+    def reset_query_stats(self):
+        if self.persistent is not None:
+            self.persistent.reset_query_stats()
+
+    def check_connection(self) -> bool:
+        if self.persistent is not None:
+            return self.persistent.check_connection()
+        return True
+
+
+def create_storage(backend: str, db_path: str = "blog.db", write_through: bool = True,
+                   sync_interval: float = 1.0, changes_retention_days: int = 30,
+                   slow_query_ms: float = 100.0) -> StorageBackend:
+    if backend == "sqlite":
+        return DatabaseManager(db_path, changes_retention_days, slow_query_ms)
+
+    if backend == "memory":
+        persistent = None
+        if write_through:
+            persistent = DatabaseManager(db_path, changes_retention_days, slow_query_ms)
+        return InMemoryStorage(persistent, sync_interval, changes_retention_days)
+
+    raise ValueError(f"Неизвестный тип хранилища: {backend}")
@@ -0,0 +1,202 @@
+import pytest
+
+from storage import create_storage
+
+
+FUTURE = "2099-01-01 00:00:00"
+BLOB = "a" * 64
+
+
+# Один и тот же набор проверок для каждого хранилища: поведение бэкендов не должно расходиться
+@pytest.fixture(params=[("sqlite", False), ("memory", False), ("memory", True)],
+                ids=["sqlite", "memory", "memory-write-through"])
+def storage(request, tmp_path):
+    backend, write_through = request.param
+    db = create_storage(backend, str(tmp_path / "blog.db"), write_through, sync_interval=0)
+    db.create_tables()
+    return db
+
+
+def titles(posts):
+    return [post.title for post in posts]
+
+
+def test_add_and_get_post(storage):
+    post_id = storage.add_post("Заголовок", "Текст")
+
+    post = storage.get_post_by_id(post_id)
+    assert post.id == post_id
+    assert post.title == "Заголовок"
+    assert post.content == "Текст"
+    assert post.created_at
+    assert post.publish_at == post.created_at
+
+
+def test_missing_post(storage):
+    assert storage.get_post_by_id(999) is None
+    assert storage.update_post(999, "t", "c") is False
+    assert storage.delete_post(999) is False
+
+
+def test_posts_are_listed_newest_first_with_id_tiebreak(storage):
+    storage.add_post("a", "1")
+    b = storage.add_post("b", "2")
+    storage.add_post("c", "3")
+    storage.delete_post(b)
+
+    posts = storage.get_all_posts()
+    # Посты, созданные в одну секунду, идут по убыванию id
+    assert posts == sorted(posts, key=lambda post: (post.created_at, post.id), reverse=True)
+    if posts[0].created_at == posts[1].created_at:
+        assert titles(posts) == ["c", "a"]
+
+
+def test_update_post_keeps_publish_at(storage):
+    post_id = storage.add_post("old", "old")
+    publish_at = storage.get_post_by_id(post_id).publish_at
+
+    assert storage.update_post(post_id, "new", "new content") is True
+
+    post = storage.get_post_by_id(post_id)
+    assert (post.title, post.content, post.publish_at) == ("new", "new content", publish_at)
+
+
+def test_delete_post(storage):
+    post_id = storage.add_post("t", "c")
+
+    assert storage.delete_post(post_id) is True
+    assert storage.get_post_by_id(post_id, include_unpublished=True) is None
+    assert storage.get_all_posts(include_unpublished=True) == []
+
+
+def test_scheduled_posts_are_hidden_until_publication(storage):
+    published = storage.add_post("published", "c")
+    later = storage.add_post("later", "c", "2099-06-01 00:00:00")
+    sooner = storage.add_post("sooner", "c", FUTURE)
+
+    assert titles(storage.get_all_posts()) == ["published"]
+    assert storage.get_post_by_id(later) is None
+    assert storage.get_post_by_id(later, include_unpublished=True).publish_at == "2099-06-01 00:00:00"
+    assert {post.id for post in storage.get_all_posts(include_unpublished=True)} == {published, later, sooner}
+    assert titles(storage.get_scheduled_posts()) == ["sooner", "later"]
+
+
+def test_update_can_reschedule(storage):
+    post_id = storage.add_post("t", "c")
+
+    storage.update_post(post_id, "t", "c", FUTURE)
+
+    assert storage.get_post_by_id(post_id) is None
+    assert [post.id for post in storage.get_scheduled_posts()] == [post_id]
+
+
+def test_changes_feed(storage):
+    first = storage.add_post("first", "c")
+    second = storage.add_post("second", "c")
+
+    result = storage.get_changes(0)
+    assert result["reset"] is False
+    assert result["has_more"] is False
+    assert [(change["post_id"], change["op"]) for change in result["changes"]] == [
+        (first, "upsert"), (second, "upsert")
+    ]
+    assert result["changes"][0]["post"].title == "first"
+
+    version = result["version"]
+    assert storage.get_changes(version)["changes"] == []
+
+    storage.update_post(first, "first v2", "c")
+    storage.delete_post(second)
+
+    changes = storage.get_changes(version)["changes"]
+    assert [(change["post_id"], change["op"]) for change in changes] == [
+        (first, "upsert"), (second, "delete")
+    ]
+    assert changes[0]["post"].title == "first v2"
+    assert changes[1]["post"] is None
+
+
+def test_changes_feed_pagination(storage):
+    ids = [storage.add_post(f"post {i}", "c") for i in range(5)]
+
+    seen = []
+    version = 0
+    while True:
+        result = storage.get_changes(version, limit=2)
+        seen.extend(change["post_id"] for change in result["changes"])
+        version = result["version"]
+        if not result["has_more"]:
+            break
+
+    assert seen == ids
+
+
+def test_attachments(storage):
+    post_id = storage.add_post("t", "c")
+
+    first = storage.add_attachment(post_id, BLOB, 10, "image/png", "a.png")
+    second = storage.add_attachment(post_id, BLOB, 10, "image/png", "b.png")
+    storage.set_telegram_file_id(BLOB, "file-id")
+
+    attachments = storage.get_attachments(post_id)
+    assert [attachment["id"] for attachment in attachments] == [first, second]
+    assert attachments[0]["filename"] == "a.png"
+    assert attachments[0]["content_type"] == "image/png"
+    assert attachments[0]["size"] == 10
+    assert attachments[0]["telegram_file_id"] == "file-id"
+    assert storage.get_blob(BLOB)["telegram_file_id"] == "file-id"
+
+    assert storage.delete_attachment(post_id, second) is True
+    assert storage.delete_attachment(post_id, second) is False
+    assert [attachment["id"] for attachment in storage.get_attachments(post_id)] == [first]
+
+    storage.delete_post(post_id)
+    assert storage.get_attachments(post_id) == []
+
+
+def test_check_connection(storage):
+    assert storage.check_connection() is True
+
+
+def test_changes_feed_hides_scheduled_posts(storage):
+    post_id = storage.add_post("Секрет", "SECRET", FUTURE)
+
+    [change] = storage.get_changes(0)["changes"]
+    assert (change["post_id"], change["op"], change["post"]) == (post_id, "delete", None)
+
+    [change] = storage.get_changes(0, include_unpublished=True)["changes"]
+    assert change["op"] == "upsert"
+    assert change["post"].content == "SECRET"
+
+
+def test_publication_is_recorded_in_changes_feed(storage):
+    post_id = storage.add_post("t", "c")
+    version = storage.get_changes(0)["version"]
+
+    assert storage.record_publication(post_id).id == post_id
+    assert storage.record_publication(999) is None
+
+    result = storage.get_changes(version)
+    assert result["version"] > version
+    assert [(change["post_id"], change["op"]) for change in result["changes"]] == [(post_id, "upsert")]
+    assert result["changes"][0]["post"].title == "t"
+
+
+def test_due_publications_until_recorded(storage):
+    from datetime import datetime, timedelta
+    import time
+
+    publish_at = (datetime.utcnow() + timedelta(seconds=1)).strftime("%Y-%m-%d %H:%M:%S")
+    post_id = storage.add_post("soon", "c", publish_at)
+    storage.add_post("now", "c")
+    storage.add_post("later", "c", FUTURE)
+    assert storage.get_due_publications() == []
+
+    # Время публикации наступило, но record_publication не вызывался (планировщик не работал)
+    deadline = time.monotonic() + 3
+    while not storage.get_due_publications() and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert [post.id for post in storage.get_due_publications()] == [post_id]
+
+    storage.record_publication(post_id)
+    assert storage.get_due_publications() == []